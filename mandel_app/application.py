@@ -1,9 +1,10 @@
 from __future__ import annotations
 import sys
 import platform
+import argparse
 
 # import gc
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from PyQt5 import QtWidgets
 
@@ -29,7 +30,17 @@ class Application:
         self.application_name: str = "Mandlebrot Explorer"
         self._os: str = platform.system()
 
-        self._q_application: QtWidgets.QApplication = QtWidgets.QApplication(sys.argv)
+        arguments, qt_arguments = self._parse_arguments()
+        # rerun the compute calibration even if there is a saved result
+        self.autotune_requested: bool = arguments.autotune
+        # compute backend for this run only, in place of the saved one
+        self.backend_requested: Optional[str] = arguments.backend
+        # seconds each view is given before it is shown as it stands, 0.0 for no limit
+        self.time_budget: float = arguments.time_budget
+        # Escape shows the view as it stands instead of throwing it away
+        self.finish_on_stop: bool = arguments.finish_on_stop
+
+        self._q_application: QtWidgets.QApplication = QtWidgets.QApplication(qt_arguments)
         # Organisation and Application must be set here so that QSettings works
         self._q_application.setOrganizationName(self.organization_name)
         self._q_application.setApplicationName(self.application_name)
@@ -41,6 +52,21 @@ class Application:
 
         self.build()
 
+    @staticmethod
+    def _parse_arguments() -> Tuple[argparse.Namespace, List[str]]:
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--autotune", action="store_true",
+                            help="calibrate the compute backend for this machine")
+        parser.add_argument("--backend",
+                            help="compute backend to use: gpu, numba, numexpr, numpy or cpu")
+        parser.add_argument("--time-budget", type=float, default=0.0, metavar="SECONDS",
+                            help="show each view as it stands after this many seconds, to be refined later")
+        parser.add_argument("--finish-on-stop", action="store_true",
+                            help="on Escape show the view as it stands instead of throwing it away")
+        # anything not recognised is left for Qt
+        arguments, remaining = parser.parse_known_args()
+        return arguments, sys.argv[:1] + remaining
+
     def build(self):
         # enable model and view to send messages to controller
         self._model.set_controller(self._controller)
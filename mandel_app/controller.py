@@ -1,4 +1,5 @@
 from __future__ import annotations
+import dataclasses
 from typing import Optional
 
 from mandel_app import application, model, view, tuples
@@ -14,12 +15,20 @@ class Controller:
 
     def build(self):
         self._view.build()
-        self._model.build(self._view.frame_shape)
         app = application.Application.instance()
+        compute_config = self._view.compute_config
+        if app.backend_requested is not None:
+            compute_config = dataclasses.replace(compute_config or mandelbrot.ComputeConfig(),
+                                                 backend=app.backend_requested)
+        self._model.build(self._view.frame_shape, compute_config)
+        self._model.set_finish_early(app.time_budget, app.finish_on_stop)
         self._has_cuda = app.has_cuda
         # thread state is needed by the application._gpu object to optimally determine if the gpu is available
         app.set_thread_state(self._model.calc_thread_state)
         self._model.calc_new_mandel(save_history=True)
+        # calibrate on first launch, or when asked, after the first view, see compute_config_ready
+        if self._view.compute_config is None or app.autotune_requested:
+            self._model.calibrate(switch_backend=app.backend_requested is None)
         # print("controller build end")
     # endregion
 
@@ -53,11 +62,13 @@ class Controller:
         # self._model.revert_to_displayed_as_new()
 
     def new_compute_parameters_request(self, max_iterations: Optional[int] = None, early_stopping: bool = True):
-        self._model.request_stop()
+        # the running job is for the old parameters, so it mustn't finish and replace the result for the new ones
+        self._model.request_stop(finish=False)
         # self._model.revert_to_displayed_as_new()
         # could be mid-way but should just stop at next yield
-        self._model.set_compute_parameters(max_iterations, early_stopping)
-        self._model.no_border_and_calc()
+        # lowering max_iterations needs no computing
+        if not self._model.set_compute_parameters(max_iterations, early_stopping):
+            self._model.no_border_and_calc()
         # if self._model.new_mandel.has_border:
         #     self._model.new_mandel.remove_border()
         # # Save history in case press back don't want to lose the work
@@ -92,6 +103,10 @@ class Controller:
         # print("progress_update")
         self._view.display_progress(progress)
 
+    # remembered for next time, the model has already switched to it unless a backend was asked for
+    def compute_config_ready(self, compute_config: mandelbrot.ComputeConfig):
+        self._view.save_compute_config(compute_config)
+
     def stop_success(self):
         # print("stop_success")
         self._view.stop_success()
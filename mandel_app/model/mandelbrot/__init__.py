@@ -1,3 +1,4 @@
 from mandel_app.model.mandelbrot.mandel import Mandel
 from mandel_app.model.mandelbrot.mandel_job import MandelJob
-from mandel_app.model.mandelbrot.compute import ComputeManager
+from mandel_app.model.mandelbrot.autotune_job import AutotuneJob
+from mandel_app.model.mandelbrot.compute import ComputeManager, ComputeConfig
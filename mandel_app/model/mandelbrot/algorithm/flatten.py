@@ -59,8 +59,11 @@ class Flatten:
         return cpu_iteration
 
     def _calc_array(self, cpu_c_flat: np.ndarray) -> np.ndarray:
-        gpu_c_flat = cp.asarray(cpu_c_flat)
-        gpu_iteration_flat = self.server.compute_flat_array(gpu_c_flat)
-        cpu_iteration_flat = cp.asnumpy(gpu_iteration_flat)
+        xp = self.server.xp
+        xp_c_flat = xp.asarray(cpu_c_flat)
+        xp_iteration_flat = self.server.compute_flat_array(xp_c_flat)
         # cpu_iteration_flat = compute_array.ComputeGpu.compute(cpu_c_flat)
-        return cpu_iteration_flat
+        if xp is np:
+            return xp_iteration_flat
+        else:
+            return cp.asnumpy(xp_iteration_flat)
@@ -1,17 +1,26 @@
 from __future__ import annotations
 
-from typing import Optional, Generator
+from typing import Optional, Generator, List, Tuple
 
 import numpy as np
 
 # import utils
 from mandel_app import tuples
 from mandel_app.model.mandelbrot import server, mandel_progress_estimator
+from mandel_app.model.mandelbrot.compute import affine
+
+# a box by the pixels of its perimeter: bottom row, left column, top row, right column
+Box = Tuple[int, int, int, int]
 
 
 class Mesh:
 
-    def __init__(self, server_: server.Server, progress_estimator: mandel_progress_estimator.MandelProgressEstimator):
+    def __init__(self,
+                 server_: server.Server,
+                 progress_estimator: mandel_progress_estimator.MandelProgressEstimator,
+                 base_size: int = 14,
+                 certify: bool = False,
+                 max_iterations: int = 0):
         self.server: server.Server = server_
         self.progress_estimator: mandel_progress_estimator.MandelProgressEstimator = progress_estimator
         self.shape: tuples.ImageShape = server_.shape
@@ -27,10 +36,21 @@ class Mesh:
         self.box_value: Optional[np.ndarray] = None
         self.box_same: Optional[np.ndarray] = None
 
+        self.base_size: int = base_size
+        # only fill a box once affine arithmetic proves every pixel in it has the value of its perimeter
+        # boxes that can't be proven are split in four and each tried again, down to min_certify_size
+        # counts needed to prove a box against, see affine.certify_boxes
+        self.certify: bool = certify
+        self.max_iterations: int = max_iterations
+        self.min_certify_size: int = 4
+        self.certified_cells: int = 0
+        self.rejected_cells: int = 0
+        self._rejected: List[Box] = []
+
         # self._timer = utils.Timer()
 
     def run(self) -> Generator[float, None, np.ndarray]:
-        base_size = 14
+        base_size = self.base_size
         if self.progress_estimator:
             self.progress_estimator.set_progress_range(progress_to=1.0, mode="WORK")
 
@@ -57,8 +77,12 @@ class Mesh:
         # self._timer.lap("vert/hori\t")
         self._check_boxes()
         # self._timer.lap("do check \t")
+        if self.certify:
+            self._certify_boxes()
         self._fill_boxes()
         # self._timer.lap("do fill  \t")
+        if self.certify:
+            yield from self._subdivide()
 
     def _do_remainder(self) -> Generator[float, None, None]:
         # self._timer.lap(f"remainder\t")
@@ -109,6 +133,80 @@ class Mesh:
                     self.box_same[row, col] = True
                     self.box_value[row, col] = value
 
+    def _certify_boxes(self):
+        rows, cols = np.nonzero(self.box_same)
+        step = self.mesh_step
+        boxes = [(row*step, col*step, (row+1)*step, (col+1)*step) for row, col in zip(rows.tolist(), cols.tolist())]
+        certified = self._certified(boxes, self.box_value[rows, cols])
+        self.box_same[rows[~certified], cols[~certified]] = False
+        self._rejected = [box for box, box_certified in zip(boxes, certified.tolist()) if not box_certified]
+
+    # boxes that failed to be proven are split in four, the lines between them computed, and each that comes out
+    # the same all round tried again
+    def _subdivide(self) -> Generator[float, None, None]:
+        while self._rejected:
+            splitting = [box for box in self._rejected
+                         if box[2] - box[0] >= self.min_certify_size and box[3] - box[1] >= self.min_certify_size]
+            self._rejected = []
+            if not splitting:
+                return
+            quarters: List[Box] = []
+            for bottom, left, top, right in splitting:
+                middle_y = (bottom + top) // 2
+                middle_x = (left + right) // 2
+                self.server.box_request(tuples.PixelPoint(x=left, y=middle_y), tuples.PixelPoint(x=right, y=middle_y))
+                self.server.box_request(tuples.PixelPoint(x=middle_x, y=bottom), tuples.PixelPoint(x=middle_x, y=top))
+                quarters += [(bottom, left, middle_y, middle_x), (bottom, middle_x, middle_y, right),
+                             (middle_y, left, top, middle_x), (middle_y, middle_x, top, right)]
+            yield from self.server.serve()
+            self.iteration = self.server.iteration_cpu
+
+            same: List[Box] = []
+            values: List[int] = []
+            for box in quarters:
+                value = self._perimeter_value(box)
+                if value is not None:
+                    same.append(box)
+                    values.append(value)
+            certified = self._certified(same, np.array(values, dtype=np.int64))
+            for box, value, box_certified in zip(same, values, certified.tolist()):
+                if box_certified:
+                    self._fill_box(box, value)
+                else:
+                    self._rejected.append(box)
+
+    # the value every pixel on the perimeter has, None if they differ
+    def _perimeter_value(self, box: Box) -> Optional[int]:
+        bottom, left, top, right = box
+        value = self.iteration[bottom, left]
+        for edge in (self.iteration[bottom, left:right + 1], self.iteration[top, left:right + 1],
+                     self.iteration[bottom:top + 1, left], self.iteration[bottom:top + 1, right]):
+            if not (edge == value).all():
+                return None
+        return int(value)
+
+    # whether affine arithmetic proves all of the inside of each box has its value
+    def _certified(self, boxes: List[Box], value: np.ndarray) -> np.ndarray:
+        if not boxes:
+            return np.zeros(shape=(0,), dtype=np.bool_)
+        c = self.server.c_cpu
+        inside = np.array(boxes, dtype=np.int64) + np.array([1, 1, -1, -1])
+        corner_1 = c[inside[:, 0], inside[:, 1]]
+        corner_2 = c[inside[:, 2], inside[:, 3]]
+        c_low = np.minimum(corner_1.real, corner_2.real) + 1j*np.minimum(corner_1.imag, corner_2.imag)
+        c_high = np.maximum(corner_1.real, corner_2.real) + 1j*np.maximum(corner_1.imag, corner_2.imag)
+        certified = affine.certify_boxes(c_low, c_high, value, self.max_iterations)
+        count = int(np.count_nonzero(certified))
+        self.certified_cells += count
+        self.rejected_cells += certified.size - count
+        return certified
+
+    def _fill_box(self, box: Box, value: int):
+        bottom, left, top, right = box
+        self.server.fill_box_request(tuples.PixelPoint(x=left + 1, y=bottom + 1),
+                                     tuples.PixelPoint(x=right - 1, y=top - 1),
+                                     value)
+
     def _fill_boxes(self):
         rows, cols = self.box_value.shape
         for row in range(rows):
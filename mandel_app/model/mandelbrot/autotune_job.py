@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from typing import Generator, Optional
+
+import thread
+from mandel_app.model.mandelbrot import compute
+from mandel_app.model.mandelbrot.compute import autotune
+
+
+# calibrates the compute backends on the calc thread, so the window is up and using the default backend meanwhile
+# queued behind the views, a stop request or a new view abandons it and it is tried again on the next launch
+class AutotuneJob(thread.Job):
+    def __init__(self,
+                 compute_manager: compute.ComputeManager,
+                 switch_backend: bool = True):
+        super().__init__()
+        self._compute_manager: compute.ComputeManager = compute_manager
+        # False if the backend was chosen for this run, the result is still kept for next time
+        self._switch_backend: bool = switch_backend
+        self.compute_config: Optional[compute.ComputeConfig] = None
+
+    def _exec(self) -> Generator[float, None, None]:
+        autotune_ = autotune.Autotune()
+        autotune_.stop_token = self.stop_token
+        try:
+            self.compute_config = yield from autotune_.calibrate()
+        except compute.Stopped:
+            return
+        # on the calc thread between jobs, so no view is being computed with the old backend
+        if self._switch_backend:
+            self._compute_manager.set_backend(self.compute_config.backend)
@@ -1 +1,3 @@
 from mandel_app.model.mandelbrot.compute.compute_manager import ComputeManager
+from mandel_app.model.mandelbrot.compute.compute_config import ComputeConfig
+from mandel_app.model.mandelbrot.compute.compute_xpu import Stopped
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import numpy as np
+
+# relative error allowed for on each bound, well over the handful of roundings in one step
+# so the bounds still hold for every exact orbit without directed rounding, which numpy doesn't have
+_EPSILON = 2.0 ** -48
+# a trapping region is tried this much wider than the orbits found so far
+_INFLATE = 2.0
+
+
+# whether every c in each box of the plane is certain to have the given iteration count
+# boxes are given by their corners, c_low with the least real and imaginary parts and c_high the greatest
+# as pixels count: z_0 = c and the count is the first n with |z_n|^2 >= 4, or max_iterations
+#
+# the orbits of a whole box are iterated together in affine arithmetic, a centre orbit, a linear term in
+# dc = c - centre and a bound on the rest:
+#   z_n = z0_n + a_n*dc + e_n   with |dc| <= rho, |e_n| <= r_n
+#   z0_n+1 = z0_n^2 + c0,  a_n+1 = 2*z0_n*a_n + 1,  r_n+1 = 2|z0_n|r_n + (|a_n|rho + r_n)^2
+# which unlike intervals doesn't lose the correlation between neighbouring orbits, so they stay tight
+# a box of escape count value must have all |z_n| < 2 before value and all |z_value| >= 2
+# a box of max_iterations must stay under 2 to the end, or be proven to forever: the rest is a bound over any e_n,
+# so at each power of two the orbits' rest is inflated and iterated alongside as a trapping region, and if that
+# comes back inside itself (for each c, as z0 and a move too) while staying under 2 it traps every orbit of the box
+def certify_boxes(c_low: np.ndarray, c_high: np.ndarray, value: np.ndarray, max_iterations: int) -> np.ndarray:
+    certified = np.zeros(shape=value.shape, dtype=np.bool_)
+    c0 = 0.5*(c_low + c_high)
+    # the pixels' c are themselves rounded
+    rho = (0.5*np.abs(c_high - c_low) + _EPSILON*np.abs(c0)) * (1.0 + _EPSILON)
+
+    # boxes still being iterated
+    index = np.arange(value.size)
+    value = value.astype(np.int64)
+    z0 = np.copy(c0)
+    a = np.ones_like(c0)
+    r = np.zeros_like(rho)
+    # trapping region being tried and its rest iterated on since, only for boxes of max_iterations
+    trap_z0 = np.copy(z0)
+    trap_a = np.copy(a)
+    trap_r = np.zeros_like(rho)
+    region_r = np.zeros_like(rho)
+    region_bounded = np.zeros_like(certified)
+
+    k = 0
+    with np.errstate(over="ignore", invalid="ignore"):
+        while index.size > 0:
+            magnitude = np.abs(z0)
+            linear = np.abs(a)*rho
+            radius = (linear + r) * (1.0 + _EPSILON)
+            bounded = (magnitude + radius) * (1.0 + _EPSILON) < 2.0
+            reached = value == k
+            escaped = (magnitude - radius) * (1.0 - _EPSILON) >= 2.0
+            region_bounded &= (magnitude + linear + region_r) * (1.0 + _EPSILON) < 2.0
+            trapped = region_bounded & (k > 0) & \
+                ((np.abs(z0 - trap_z0) + np.abs(a - trap_a)*rho + region_r) * (1.0 + _EPSILON) <= trap_r)
+
+            # done is certified or rejected, either way the box stops being iterated
+            done = reached | ~bounded | trapped
+            certified[index[reached & ((value >= max_iterations) | escaped)]] = True
+            certified[index[trapped]] = True
+
+            if done.any():
+                keep = ~done
+                index = index[keep]
+                value = value[keep]
+                c0 = c0[keep]
+                rho = rho[keep]
+                z0 = z0[keep]
+                a = a[keep]
+                r = r[keep]
+                magnitude = magnitude[keep]
+                linear = linear[keep]
+                trap_z0 = trap_z0[keep]
+                trap_a = trap_a[keep]
+                trap_r = trap_r[keep]
+                region_r = region_r[keep]
+                region_bounded = region_bounded[keep]
+
+            if k & (k - 1) == 0:
+                # a new trapping region about where the orbits are now
+                trap_z0 = np.copy(z0)
+                trap_a = np.copy(a)
+                trap_r = _INFLATE * (linear + r)
+                region_r = trap_r
+                region_bounded = (value >= max_iterations) & ((magnitude + linear + region_r) * (1.0 + _EPSILON) < 2.0)
+
+            # the rest first, then the linear term, then the centre, each from the values before the step
+            rounding = _EPSILON * (magnitude*magnitude + np.abs(c0) + (2.0*magnitude*np.abs(a) + 1.0)*rho)
+            r = _rest_step(r, magnitude, linear, rounding)
+            region_r = _rest_step(region_r, magnitude, linear, rounding)
+            a = 2.0*z0*a + 1.0
+            z0 = z0*z0 + c0
+            k += 1
+
+    return certified
+
+
+# the bound on the rest after a step, from the bound before it
+def _rest_step(r: np.ndarray, magnitude: np.ndarray, linear: np.ndarray, rounding: np.ndarray) -> np.ndarray:
+    return (2.0*magnitude*r + (linear + r)**2 + rounding) * (1.0 + _EPSILON)
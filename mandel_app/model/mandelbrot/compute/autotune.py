@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import threading
+from typing import Generator, List, Optional, Tuple
+
+import numpy as np
+
+import utils
+from mandel_app import tuples
+from mandel_app.model.mandelbrot import mandel
+from mandel_app.model.mandelbrot.compute import compute_benchmark, compute_config, compute_manager, backends
+
+
+# short calibration of every backend available on this machine at a few pixel counts against the stock views
+# the fastest overall becomes the ComputeConfig's backend
+# timed through ComputeManager.compute_flat_array, so including prefiltering, compaction and early stopping,
+# with its KernelSizer adapting the kernel size as it would for a job
+# like Flatten.speed_test, the pixel counts show where each backend's fixed overheads stop mattering
+# in the application it is run on the calc thread by AutotuneJob, yielding between kernels so it can be stopped
+# run from the project directory: python -m mandel_app.model.mandelbrot.compute.autotune
+class Autotune:
+    def __init__(self,
+                 shape: tuples.ImageShape = tuples.ImageShape(x=400, y=250),
+                 end_iter: int = 2000,
+                 pixel_counts: Tuple[int, ...] = (2**10, 2**12, 2**14),
+                 time_limit: float = 1.0):
+        self.end_iter: int = end_iter
+        self.pixel_counts: Tuple[int, ...] = pixel_counts
+        # a backend that takes longer than this in total isn't tried on any larger pixel counts
+        self.time_limit: float = time_limit
+        # passed on to each ComputeManager, so a stop request ends it part way through a kernel
+        self.stop_token: Optional[threading.Event] = None
+        self._timer = utils.Timer()
+        benchmark = compute_benchmark.ComputeBenchmark(shape=shape, end_iter=end_iter)
+        self._views: List[Tuple[mandel.Mandel, np.ndarray]] = [(mandel_, benchmark.generate_c(mandel_))
+                                                               for mandel_ in benchmark.views.values()]
+
+    def run(self, show: bool = False) -> compute_config.ComputeConfig:
+        generator = self.calibrate(show)
+        while True:
+            try:
+                next(generator)
+            except StopIteration as stop:
+                return stop.value
+
+    def calibrate(self, show: bool = False) -> Generator[float, None, compute_config.ComputeConfig]:
+        best: Optional[compute_config.ComputeConfig] = None
+        best_rate: float = 0.0
+        for backend in backends.available_backends().values():
+            manager = compute_manager.ComputeManager(self.end_iter,
+                                                     config=compute_config.ComputeConfig(backend=backend.name))
+            manager.stop_token = self.stop_token
+            try:
+                # keep one-off costs such as jit compiling and starting worker processes out of the timings
+                yield from self._time(manager, self._views[0][0], self._sample(self._views[0][1], 16))
+                rate = yield from self._measure(manager)
+            finally:
+                manager.shutdown()
+            # it fell back to another backend, so this one can't be relied on
+            if manager.backend.name != backend.name:
+                continue
+            if show:
+                print(f"{backend.name}\t{rate / 10**6:.4f} mega-pixels/s")
+            if rate > best_rate:
+                best_rate = rate
+                best = compute_config.ComputeConfig(backend=backend.name)
+
+        if best is None:
+            best = compute_config.ComputeConfig()
+        if show:
+            print(f"best: {best}")
+        return best
+
+    # pixels per second over all the views and pixel counts it got through
+    def _measure(self, manager: compute_manager.ComputeManager) -> Generator[float, None, float]:
+        total_pixels: int = 0
+        total_time: float = 0.0
+        for pixel_count in self.pixel_counts:
+            for mandel_, c_view in self._views:
+                time = yield from self._time(manager, mandel_, self._sample(c_view, pixel_count))
+                total_pixels += pixel_count
+                total_time += time
+            if total_time > self.time_limit:
+                break
+        if total_time == 0.0:
+            return 0.0
+        return float(total_pixels) / total_time
+
+    @staticmethod
+    def _sample(c_view: np.ndarray, pixel_count: int) -> np.ndarray:
+        # spread over the whole view so it has the same mix of fast and slow pixels
+        indices = np.linspace(0, c_view.size - 1, num=min(pixel_count, c_view.size)).astype(np.int64)
+        return c_view[indices]
+
+    # the time spent yielding is left in, it is only a stop check on the calc thread
+    def _time(self, manager: compute_manager.ComputeManager, mandel_: mandel.Mandel, c: np.ndarray) \
+            -> Generator[float, None, float]:
+        manager.reset_statistics()
+        manager.set_view(mandel_)
+        self._timer.start()
+        yield from manager.compute_flat_array(c)
+        return self._timer.stop(show=False)
+
+
+if __name__ == "__main__":
+    autotune = Autotune()
+    autotune.run(show=True)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+# import cupy as cp
+try:
+    import cupy as cp
+except ImportError:
+    cp = None
+except AttributeError:
+    cp = None
+
+import utils
+from mandel_app import application
+from mandel_app.model.mandelbrot.compute import compute_xpu, compute_cpu, compute_gpu, compute_numba, \
+    compute_numexpr, compute_numpy
+
+
+# a named compute engine and what it can do
+@dataclass(frozen=True)
+class Backend:
+    name: str
+    create: Callable[[], compute_xpu.ComputeXpu]
+    # array module the engine takes and returns arrays in, None if it isn't installed
+    xp: Optional[ModuleType]
+    is_available: Callable[[], bool]
+    # floating point formats it iterates in
+    precisions: Tuple[str, ...] = ("float64",)
+    # False if the work is done in other processes, so arrays are copied across
+    in_process: bool = True
+    # can stop pixels near an attracting cycle early, see ComputeXpu.near_return_tolerance
+    tracks_derivative: bool = False
+    # deals pixels out most expensive first given ComputeXpu.cost_hint, so it is worth Server predicting them
+    orders_by_cost: bool = False
+
+
+# in order of preference when none has been chosen
+_registry: Dict[str, Backend] = {}
+
+
+def register(backend: Backend):
+    _registry[backend.name] = backend
+
+
+def registered_backends() -> List[Backend]:
+    return list(_registry.values())
+
+
+# backends that can run on this machine by name, in order of preference
+def available_backends() -> Dict[str, Backend]:
+    return {name: backend for name, backend in _registry.items() if backend.is_available()}
+
+
+def _has_cuda() -> bool:
+    app = application.Application.instance()
+    # outside the application, such as running autotune on its own, check directly
+    if app is None:
+        return utils.Gpu().has_cuda
+    else:
+        return app.has_cuda
+
+
+register(Backend(name="gpu",
+                 create=compute_gpu.ComputeGpu,
+                 xp=cp,
+                 is_available=_has_cuda))
+register(Backend(name="numba",
+                 create=compute_numba.ComputeNumba,
+                 xp=np,
+                 is_available=compute_numba.is_available,
+                 tracks_derivative=True))
+register(Backend(name="numexpr",
+                 create=compute_numexpr.ComputeNumexpr,
+                 xp=np,
+                 is_available=compute_numexpr.is_available))
+register(Backend(name="numpy",
+                 create=compute_numpy.ComputeNumpy,
+                 xp=np,
+                 is_available=lambda: True,
+                 precisions=("float64", "float32")))
+register(Backend(name="cpu",
+                 create=compute_cpu.ComputeCpu,
+                 xp=np,
+                 is_available=lambda: True,
+                 in_process=False,
+                 tracks_derivative=True,
+                 orders_by_cost=True))
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from typing import Dict, Union
+
+import numpy as np
+# import cupy as cp
+try:
+    import cupy as cp
+except ImportError:
+    cp = None
+except AttributeError:
+    cp = None
+
+if cp is None:
+    xp_ndarray = np.ndarray
+else:
+    xp_ndarray = Union[np.ndarray, cp.ndarray]
+
+
+# named flat buffers that are kept and reused between calls, only reallocated when a bigger one is needed
+# get returns a view of exactly the size asked for, its contents are whatever was last left in it
+class BufferArena:
+    def __init__(self):
+        self._buffers: Dict[str, xp_ndarray] = {}
+        # since the last reset_counts
+        self.allocations: int = 0
+        self.peak_bytes: int = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(int(buffer.nbytes) for buffer in self._buffers.values())
+
+    def get(self, name: str, size: int, dtype, xp=np) -> xp_ndarray:
+        buffer = self._buffers.get(name)
+        if buffer is None or \
+                buffer.size < size or \
+                buffer.dtype != xp.dtype(dtype) or \
+                not isinstance(buffer, xp.ndarray):
+            # drop the old buffer first so both are never held at once
+            self._buffers.pop(name, None)
+            buffer = xp.empty(shape=(size,), dtype=dtype)
+            self._buffers[name] = buffer
+            self.allocations += 1
+            self.peak_bytes = max(self.peak_bytes, self.total_bytes)
+        return buffer[:size]
+
+    def reset_counts(self):
+        self.allocations = 0
+        self.peak_bytes = self.total_bytes
+
+    def release(self):
+        self._buffers.clear()
+        self.reset_counts()
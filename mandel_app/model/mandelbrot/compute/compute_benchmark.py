@@ -0,0 +1,167 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import utils
+from mandel_app import tuples
+from mandel_app.model import model
+from mandel_app.model.mandelbrot import mandel
+from mandel_app.model.mandelbrot.compute import compute_xpu, compute_cpu, compute_numba, compute_numexpr, \
+    compute_numpy, compute_double_double, compute_config, compute_manager
+
+
+# times each compute engine on the stock Model views
+# numpy is also timed checking for escape every iteration, as it did before ComputeNumpy.block_size
+# cpu is given a cost_hint from a coarse pass, as Server would from the previous Mesh pass, and is also timed dealing
+# pixels out in raster order, with how busy each worker process was to show any idle tail
+# double-double is also compared with plain float64 numpy, to help tune ComputeManager.precision_margin
+# and ComputeManager is timed with and without mixed_precision, to see if the float32 pass pays
+# run from the project directory: python -m mandel_app.model.mandelbrot.compute.compute_benchmark
+class ComputeBenchmark:
+    def __init__(self,
+                 shape: tuples.ImageShape = tuples.ImageShape(x=400, y=250),
+                 end_iter: int = 1000):
+        self.shape: tuples.ImageShape = shape
+        self.end_iter: int = end_iter
+        self.iterations_per_kernel: int = 1000
+        self.timer = utils.Timer()
+        self.views: Dict[str, mandel.Mandel] = self._stock_views()
+
+    def _stock_views(self) -> Dict[str, mandel.Mandel]:
+        model_ = model.Model()
+        # noinspection PyProtectedMember
+        model_._frame_shape = self.shape
+        # noinspection PyProtectedMember
+        return {
+            "initial": model_._initial_mandel(),
+            "different": model_._different_mandel()
+        }
+
+    @staticmethod
+    def generate_c(mandel_: mandel.Mandel) -> np.ndarray:
+        # as Server._generate_c
+        m = mandel_
+        y, x = np.ogrid[-m.y_size/2.0: m.y_size/2.0: m.shape.y * 1j,
+                        -m.x_size/2.0: m.x_size/2.0: m.shape.x * 1j]
+        c = m.centre + x*m.x_unit + y*m.y_unit
+        return c.flatten()
+
+    def engines(self) -> List[Tuple[str, compute_xpu.ComputeXpu]]:
+        engines: List[Tuple[str, compute_xpu.ComputeXpu]] = [
+            ("cpu", compute_cpu.ComputeCpu()),
+            ("numpy", compute_numpy.ComputeNumpy())
+        ]
+        raster = compute_cpu.ComputeCpu()
+        raster.order_by_cost = False
+        engines.append(("cpu_raster", raster))
+        # checking for escape every iteration, to see what batching the checks into blocks saves
+        unblocked = compute_numpy.ComputeNumpy()
+        unblocked.block_size = 1
+        engines.append(("numpy_unblocked", unblocked))
+        if compute_numexpr.is_available():
+            engines.append(("numexpr", compute_numexpr.ComputeNumexpr()))
+        if compute_numba.is_available():
+            engines.append(("numba", compute_numba.ComputeNumba()))
+        engines.append(("double_double", compute_double_double.ComputeDoubleDouble()))
+        return engines
+
+    # every step-th pixel of each row and column iterated, each pixel costed as the one at the corner of its step
+    def coarse_cost(self, c: np.ndarray, step: int = 4) -> np.ndarray:
+        coarse_c = c.reshape((self.shape.y, self.shape.x))[::step, ::step]
+        _, coarse = self.time_engine(compute_numpy.ComputeNumpy(), coarse_c.ravel())
+        coarse[coarse == -1] = self.end_iter
+        coarse = coarse.reshape(coarse_c.shape)
+        cost = np.repeat(np.repeat(coarse, step, axis=0), step, axis=1)
+        return cost[:self.shape.y, :self.shape.x].ravel()
+
+    def time_engine(self, compute: compute_xpu.ComputeXpu, c: np.ndarray) -> Tuple[float, np.ndarray]:
+        z = np.copy(c)
+        iteration = np.zeros(shape=c.shape, dtype=np.int32)
+        compute.iterations_per_kernel = self.iterations_per_kernel
+        compute.reset_utilisation()
+        self.timer.start()
+        for _ in compute.compute_iterations(c, z, iteration, 0, self.end_iter):
+            pass
+        time = self.timer.stop(show=False)
+        return time, iteration
+
+    def run(self):
+        engines = self.engines()
+        # keep one-off costs such as jit compiling and starting worker processes out of the timings
+        warm_up_c = np.zeros(shape=(16,), dtype=np.complex128)
+        for _, compute in engines:
+            self.time_engine(compute, warm_up_c)
+
+        for view_name, mandel_ in self.views.items():
+            c = self.generate_c(mandel_)
+            print(f"\n{view_name}: {c.size} pixels, {self.end_iter} iterations")
+            results: Dict[str, np.ndarray] = {}
+            times: Dict[str, float] = {}
+            cost = self.coarse_cost(c)
+            for engine_name, compute in engines:
+                compute.cost_hint = cost
+                time, iteration = self.time_engine(compute, c)
+                times[engine_name] = time
+                mega_pixels_per_second = (c.size / time) / 10**6
+                print(f"{engine_name}\t{time:.3f}s\t{mega_pixels_per_second:.4f} mega-pixels/s")
+                utilisation = compute.worker_utilisation()
+                if utilisation:
+                    print(f"{engine_name} worker utilisation\t{' '.join(f'{busy:.2f}' for busy in utilisation)}")
+                # trapped (-1) and still continuing both end up as max_iterations in ComputeManager
+                iteration[iteration == -1] = self.end_iter
+                results[engine_name] = iteration
+
+            # all engines should agree with the first (reference) engine
+            # except double_double, wherever float64 rounding has changed the result
+            reference_name, reference = next(iter(results.items()))
+            for engine_name, iteration in results.items():
+                if engine_name != reference_name:
+                    mismatches = np.count_nonzero(iteration != reference)
+                    print(f"{engine_name} vs {reference_name}\t{mismatches} mismatched pixels")
+
+            # the same vectorized loop in both so this is the cost of the extra precision
+            print(f"double_double is {times['double_double'] / times['numpy']:.1f} times slower than numpy")
+
+        for _, compute in engines:
+            compute.shutdown()
+
+        self.compare_mixed_precision()
+
+    # the whole of ComputeManager, so including prefiltering, compaction and early stopping
+    def compare_mixed_precision(self):
+        config = compute_config.ComputeConfig(backend="numpy", iterations_per_kernel=self.iterations_per_kernel)
+        manager = compute_manager.ComputeManager(self.end_iter, config=config)
+        for view_name, mandel_ in self.views.items():
+            c = self.generate_c(mandel_)
+            print(f"\n{view_name}: ComputeManager on numpy, max {self.end_iter} iterations")
+            results: Dict[bool, np.ndarray] = {}
+            times: Dict[bool, float] = {}
+            for mixed_precision in (False, True):
+                manager.mixed_precision = mixed_precision
+                manager.reset_statistics()
+                manager.set_view(mandel_)
+                self.timer.start()
+                results[mixed_precision] = self._result(manager, c)
+                times[mixed_precision] = self.timer.stop(show=False)
+                print(f"{manager.precision}\t{times[mixed_precision]:.3f}s\t"
+                      f"{manager.statistics.single_recomputed_pixels} pixels recomputed in float64")
+
+            mismatches = np.count_nonzero(results[True] != results[False])
+            print(f"mixed precision vs float64\t{mismatches} mismatched pixels")
+            print(f"mixed precision takes {times[True] / times[False]:.2f} times as long as float64")
+        manager.shutdown()
+
+    # a for loop would throw away the return value
+    @staticmethod
+    def _result(manager: compute_manager.ComputeManager, c: np.ndarray) -> np.ndarray:
+        generator = manager.compute_flat_array(c)
+        while True:
+            try:
+                next(generator)
+            except StopIteration as stop:
+                return stop.value
+
+
+if __name__ == "__main__":
+    compute_benchmark = ComputeBenchmark()
+    compute_benchmark.run()
@@ -0,0 +1,11 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+
+# which engine ComputeManager uses, chosen by autotune for this machine, and how it starts sizing kernels
+@dataclass
+class ComputeConfig:
+    # name from backends.available_backends, empty for the default choice
+    backend: str = ""
+    iterations_per_kernel: int = 1000
@@ -1,7 +1,9 @@
 from __future__ import annotations
-from typing import Generator
+from typing import Generator, Optional, Dict, List, Tuple
+import math
+import time
 import multiprocessing
-import itertools
+from multiprocessing import pool as mp_pool, shared_memory
 
 import numpy as np
 
@@ -9,68 +11,216 @@ from mandel_app.model.mandelbrot.compute import compute_xpu, cpu_pixel
 
 
 # all cpu
+# a persistent pool of worker processes iterates c, z and iteration held in shared memory
+# the pixels still going are put in order, most expensive first by cost_hint, and dealt out as ranges of that order
+# in chunks that shrink as the work runs out, each worker taking the next chunk as soon as it is free
+# so the interior pixels aren't left until last and no worker sits idle at the tail while another finishes
 class ComputeCpu(compute_xpu.ComputeXpu):
+    # False deals the pixels out in raster order in equal chunks, as it used to, for comparison
+    order_by_cost: bool = True
+    # each chunk is this many times less than a process's share of the work left
+    chunks_per_process: int = 2
+    # fewest pixels in a chunk, so the tail isn't all the overhead of handing out tasks
+    min_chunk_size: int = 16
+    # seconds between looks at stop_token while the workers are busy
+    stop_poll_seconds: float = 0.05
+
     def __init__(self):  # high_precision=True)
         super().__init__()
 
-        self._c: np.ndarray = np.array([], dtype=np.complex)
-        self._z: np.ndarray = np.array([], dtype=np.complex)
+        self._pool: Optional[mp_pool.Pool] = None
+        self._processes: int = multiprocessing.cpu_count()
+
+        # shared memory buffers, only ever grow so they can be reused across kernels and jobs
+        self._capacity: int = 0
+        self._shared: Dict[str, shared_memory.SharedMemory] = {}
+
+        self._c: np.ndarray = np.array([], dtype=np.complex128)
+        self._z: np.ndarray = np.array([], dtype=np.complex128)
         self._iteration: np.ndarray = np.array([], dtype=np.int32)
+        self._z_saved: np.ndarray = np.array([], dtype=np.complex128)
+        # pixel positions in the order they are dealt out, workers iterate ranges of it
+        self._order: np.ndarray = np.array([], dtype=np.int64)
+        # set to 1 once stop_token is set, the workers look at it between pixels
+        self._stop_flag: np.ndarray = np.array([], dtype=np.int8)
+
+        # iteration that all pixels still going have reached
+        self._k: int = 0
+        self._cost: Optional[np.ndarray] = None
+
+        # seconds each worker process, by id, was busy and seconds the pool had work, since reset_utilisation
+        self._busy_seconds: Dict[int, float] = {}
+        self._pool_seconds: float = 0.0
 
     # calculates iterations in parallel between start_iter and end_iter
     # inputs: a flat c gpu array and z starting values
-    # outputs: z ending values and iterations (set to end_iter if still going)
+    # outputs: z ending values and iterations (set to end_iter if still going, -1 if trapped in a cycle)
     def compute_iterations(self,
                            c_in: np.ndarray,
                            z_in: np.ndarray,
                            iteration_in: np.ndarray,
                            start_iter: int,
-                           end_iter: int
+                           end_iter: int,
+                           z_saved_in: Optional[np.ndarray] = None
                            ) -> Generator[float, None, None]:
-        # print(z_in[100])
-        self._c = c_in
-        self._z = z_in
-        self._iteration = iteration_in
         self._request_size = iteration_in.size
+        self._reserve_shared(self._request_size)
 
-        self._prev_total_iterations = np.sum(self._iteration)
+        self._c[:self._request_size] = c_in
+        self._z[:self._request_size] = z_in
+        self._iteration[:self._request_size] = iteration_in
+        if z_saved_in is None:
+            self._z_saved[:self._request_size] = z_in
+        else:
+            self._z_saved[:self._request_size] = z_saved_in
+        self._k = start_iter
+        if self.cost_hint is not None and self.cost_hint.size == self._request_size:
+            self._cost = self.cost_hint
+        else:
+            self._cost = None
 
-        end_points = range(start_iter+self.iterations_per_kernel,
-                           end_iter+1,
-                           self.iterations_per_kernel)
+        end_points = self._end_points(start_iter, end_iter)
         for end_point in end_points:
-            # print(f"end_point: {end_point}")
             iterations_done = self._calculate_to(end_point)
-            # print(f"iterations_done: {iterations_done}")
             yield float(iterations_done)
-        # print(self._z[100])
 
-        # z_in[:] = self._z[:]
-        # iteration_in[:] = self._iteration[:]
-
-        np.copyto(dst=z_in, src=self._z)
-        np.copyto(dst=iteration_in, src=self._iteration)
+        np.copyto(dst=z_in, src=self._z[:self._request_size])
+        np.copyto(dst=iteration_in, src=self._iteration[:self._request_size])
+        if z_saved_in is not None:
+            np.copyto(dst=z_saved_in, src=self._z_saved[:self._request_size])
 
     def _calculate_to(self, end_point: int) -> int:
-        # print(self._z[100])
-
-        with multiprocessing.Pool() as pool:
-            results = pool.starmap(cpu_pixel.do_pixel,
-                                   zip(self._c,
-                                       self._z,
-                                       self._iteration,
-                                       itertools.repeat(end_point)
-                                       )
-                                   )
-        self._z = np.array([z for z, i in results], dtype=np.complex)
-        self._iteration = np.array([i for z, i in results], dtype=np.int32)
-
-        # print(self._z[100])
-
-        # approximation to the work done
-        return self._request_size * self.iterations_per_kernel
-        # full calculation code:
-        # new_total_iterations = np.sum(self._iteration)
-        # iterations_done = new_total_iterations - self._prev_total_iterations
-        # self._prev_total_iterations = new_total_iterations
-        # return iterations_done
+        # workers write their results straight back into the shared arrays
+        pool = self._get_pool()
+        names = tuple(self._shared[key].name for key in ("c", "z", "iteration", "z_saved", "order", "stop"))
+        near_return_squared = self.near_return_tolerance * self.near_return_tolerance
+        ranges = self._ranges(end_point)
+        self._stop_flag[0] = 0
+
+        start = time.perf_counter()
+        iterations_done = 0
+        results = pool.imap_unordered(self._do_range,
+                                      [(names, self._capacity, range_start, range_stop, end_point,
+                                        near_return_squared)
+                                       for range_start, range_stop in ranges])
+        # waits a little at a time to pass on a stop, the workers then give up their ranges and all are collected
+        while True:
+            if self._stop_requested():
+                self._stop_flag[0] = 1
+            try:
+                pid, seconds, work = results.next(timeout=self.stop_poll_seconds)
+            except multiprocessing.TimeoutError:
+                continue
+            except StopIteration:
+                break
+            self._busy_seconds[pid] = self._busy_seconds.get(pid, 0.0) + seconds
+            iterations_done += work
+        if ranges:
+            self._pool_seconds += time.perf_counter() - start
+        self._check_stop()
+        self._k = end_point
+        return iterations_done
+
+    # imap_unordered passes a single argument
+    @staticmethod
+    def _do_range(arguments: Tuple) -> Tuple[int, float, int]:
+        return cpu_pixel.do_range(*arguments)
+
+    # puts the pixels still going in order and splits it into the ranges handed to the workers
+    def _ranges(self, end_point: int) -> List[Tuple[int, int]]:
+        # pixels stopped before this kernel return straight away, so aren't worth a place
+        c_size = self._request_size
+        z = self._z[:c_size]
+        going = np.flatnonzero((self._iteration[:c_size] == self._k) & (z.real*z.real + z.imag*z.imag < 4.0))
+        if going.size == 0:
+            return []
+
+        if not self.order_by_cost:
+            self._order[:going.size] = going
+            # several ranges per process so a slow range doesn't leave the others idle for long
+            chunk_size = max(1, math.ceil(going.size / (self._processes * 4)))
+            return [(start, min(start + chunk_size, going.size))
+                    for start in range(0, going.size, chunk_size)]
+
+        # iterations each pixel is expected to take in this kernel, all of it where there is no prediction
+        # a stable sort so equal costs stay in raster order
+        kernel_iterations = end_point - self._k
+        if self._cost is None:
+            cost = np.full(shape=going.shape, fill_value=float(kernel_iterations))
+        else:
+            cost = np.clip(self._cost[going] - self._k, 1, kernel_iterations).astype(np.float64)
+            by_cost = np.argsort(-cost, kind="stable")
+            going = going[by_cost]
+            cost = cost[by_cost]
+        self._order[:going.size] = going
+
+        # guided: each chunk takes its share of the work left, so the chunks shrink towards the cheap end
+        cumulative_cost = np.cumsum(cost)
+        total_cost = float(cumulative_cost[-1])
+        ranges: List[Tuple[int, int]] = []
+        start = 0
+        while start < going.size:
+            done = 0.0 if start == 0 else float(cumulative_cost[start - 1])
+            share = (total_cost - done) / (self._processes * self.chunks_per_process)
+            stop = int(np.searchsorted(cumulative_cost, done + share, side="left")) + 1
+            stop = min(max(stop, start + self.min_chunk_size), going.size)
+            ranges.append((start, stop))
+            start = stop
+        return ranges
+
+    def worker_utilisation(self) -> List[float]:
+        if self._pool_seconds == 0.0:
+            return []
+        return [busy / self._pool_seconds for busy in self._busy_seconds.values()]
+
+    def reset_utilisation(self):
+        self._busy_seconds = {}
+        self._pool_seconds = 0.0
+
+    def _get_pool(self) -> mp_pool.Pool:
+        if self._pool is None:
+            # spawn rather than fork: forking a process that has thread pools running (numba, numexpr) isn't safe
+            # and spawn is what Windows does anyway
+            context = multiprocessing.get_context("spawn")
+            self._pool = context.Pool(processes=self._processes)
+        return self._pool
+
+    def _reserve_shared(self, size: int):
+        if size <= self._capacity:
+            return
+        self._release_shared()
+        self._capacity = size
+        self._c = self._create_shared("c", np.complex128)
+        self._z = self._create_shared("z", np.complex128)
+        self._iteration = self._create_shared("iteration", np.int32)
+        self._z_saved = self._create_shared("z_saved", np.complex128)
+        self._order = self._create_shared("order", np.int64)
+        self._stop_flag = self._create_shared("stop", np.int8, size=1)
+
+    def _create_shared(self, key: str, dtype: type, size: Optional[int] = None) -> np.ndarray:
+        size = self._capacity if size is None else size
+        nbytes = size * np.dtype(dtype).itemsize
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._shared[key] = shm
+        return np.ndarray(shape=(size,), dtype=dtype, buffer=shm.buf)
+
+    def _release_shared(self):
+        # views must be dropped before the memory can be closed
+        self._c = np.array([], dtype=np.complex128)
+        self._z = np.array([], dtype=np.complex128)
+        self._iteration = np.array([], dtype=np.int32)
+        self._z_saved = np.array([], dtype=np.complex128)
+        self._order = np.array([], dtype=np.int64)
+        self._stop_flag = np.array([], dtype=np.int8)
+        for shm in self._shared.values():
+            shm.close()
+            shm.unlink()
+        self._shared.clear()
+        self._capacity = 0
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._release_shared()
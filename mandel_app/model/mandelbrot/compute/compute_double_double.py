@@ -0,0 +1,212 @@
+from __future__ import annotations
+from typing import Generator, Optional, Tuple
+
+import numpy as np
+
+from mandel_app.model.mandelbrot.compute import compute_xpu
+
+# a double-double is an unevaluated sum hi + lo of two float64 with |lo| <= half an ulp of hi, about 106 bits
+# each function works element-wise on arrays (or float scalars) and returns a (hi, lo) pair
+DoubleDouble = Tuple[np.ndarray, np.ndarray]
+
+# 2^27 + 1, for splitting a float64 into two 26 bit halves (numpy has no fused multiply-add)
+_SPLITTER = 134217729.0
+
+
+# error-free transformations: hi is the rounded result, lo is exactly what the rounding lost
+def two_sum(a, b) -> DoubleDouble:
+    s = a + b
+    bb = s - a
+    e = (a - (s - bb)) + (b - bb)
+    return s, e
+
+
+# as two_sum when |a| >= |b|
+def quick_two_sum(a, b) -> DoubleDouble:
+    s = a + b
+    e = b - (s - a)
+    return s, e
+
+
+def _split(a) -> DoubleDouble:
+    t = _SPLITTER * a
+    hi = t - (t - a)
+    return hi, a - hi
+
+
+def two_product(a, b) -> DoubleDouble:
+    p = a * b
+    a_hi, a_lo = _split(a)
+    b_hi, b_lo = _split(b)
+    e = ((a_hi*b_hi - p) + a_hi*b_lo + a_lo*b_hi) + a_lo*b_lo
+    return p, e
+
+
+def add(a: DoubleDouble, b: DoubleDouble) -> DoubleDouble:
+    # the accurate version, x*x - y*y cancels heavily near the boundary
+    s1, s2 = two_sum(a[0], b[0])
+    t1, t2 = two_sum(a[1], b[1])
+    s2 += t1
+    s1, s2 = quick_two_sum(s1, s2)
+    s2 += t2
+    return quick_two_sum(s1, s2)
+
+
+def subtract(a: DoubleDouble, b: DoubleDouble) -> DoubleDouble:
+    return add(a, (-b[0], -b[1]))
+
+
+def multiply(a: DoubleDouble, b: DoubleDouble) -> DoubleDouble:
+    p, e = two_product(a[0], b[0])
+    e += a[0]*b[1] + a[1]*b[0]
+    return quick_two_sum(p, e)
+
+
+# all cpu, vectorized, for zooms where c can no longer be told apart from its neighbours in float64
+# the same lockstep loop as ComputeNumpy with c, z and the cycle detection point all held as double-doubles
+# c_in, z_in and z_saved_in are the hi parts, the lo parts come as extra arrays so ComputeManager can compact them
+class ComputeDoubleDouble(compute_xpu.ComputeXpu):
+    def __init__(self):
+        super().__init__()
+
+        self._c: np.ndarray = np.array([], dtype=np.complex128)
+        self._z: np.ndarray = np.array([], dtype=np.complex128)
+        self._iteration: np.ndarray = np.array([], dtype=np.int32)
+        self._z_saved: np.ndarray = np.array([], dtype=np.complex128)
+        self._c_lo: np.ndarray = np.array([], dtype=np.complex128)
+        self._z_lo: np.ndarray = np.array([], dtype=np.complex128)
+        self._z_saved_lo: np.ndarray = np.array([], dtype=np.complex128)
+
+        # iteration that all active pixels have reached (continuing pixels always share start_iter)
+        self._k: int = 0
+
+        # active pixels: their position in the request and their state as (hi, lo) pairs
+        self._index: np.ndarray = np.array([], dtype=np.int64)
+        self._cx: DoubleDouble = (np.array([]), np.array([]))
+        self._cy: DoubleDouble = (np.array([]), np.array([]))
+        self._x: DoubleDouble = (np.array([]), np.array([]))
+        self._y: DoubleDouble = (np.array([]), np.array([]))
+        self._sx: DoubleDouble = (np.array([]), np.array([]))
+        self._sy: DoubleDouble = (np.array([]), np.array([]))
+
+    # calculates iterations in parallel between start_iter and end_iter
+    # inputs: a flat c array and z starting values, with their lo parts (zero if not given)
+    # outputs: z ending values and iterations (set to end_iter if still going, -1 if trapped in a cycle)
+    def compute_iterations(self,
+                           c_in: np.ndarray,
+                           z_in: np.ndarray,
+                           iteration_in: np.ndarray,
+                           start_iter: int,
+                           end_iter: int,
+                           z_saved_in: Optional[np.ndarray] = None,
+                           c_lo_in: Optional[np.ndarray] = None,
+                           z_lo_in: Optional[np.ndarray] = None,
+                           z_saved_lo_in: Optional[np.ndarray] = None
+                           ) -> Generator[float, None, None]:
+        # work directly on the arrays passed in, results are written back in place
+        self._c = c_in
+        self._z = z_in
+        self._iteration = iteration_in
+        self._z_saved = np.copy(z_in) if z_saved_in is None else z_saved_in
+        self._c_lo = np.zeros_like(c_in) if c_lo_in is None else c_lo_in
+        self._z_lo = np.zeros_like(z_in) if z_lo_in is None else z_lo_in
+        self._z_saved_lo = np.copy(self._z_lo) if z_saved_lo_in is None else z_saved_lo_in
+        self._request_size = iteration_in.size
+        self._k = start_iter
+
+        end_points = self._end_points(start_iter, end_iter)
+        for end_point in end_points:
+            iterations_done = self._calculate_to(end_point)
+            yield float(iterations_done)
+
+    def _calculate_to(self, end_point: int) -> int:
+        # same loop as ComputeNumpy._calculate_to
+        self._gather_active()
+
+        k = self._k
+        # iterations done, one for each pixel still active at each step
+        work = 0
+        while self._index.size > 0:
+            self._check_stop()
+            self._step()
+            k += 1
+            work += self._index.size
+
+            # Brent-style cycle detection, both parts have to match
+            trapped = (self._x[0] == self._sx[0]) & (self._x[1] == self._sx[1]) & \
+                      (self._y[0] == self._sy[0]) & (self._y[1] == self._sy[1])
+            if k & (k - 1) == 0:
+                self._sx = (np.copy(self._x[0]), np.copy(self._x[1]))
+                self._sy = (np.copy(self._y[0]), np.copy(self._y[1]))
+
+            if k == end_point:
+                if trapped.any():
+                    self._retire(trapped, -1)
+                break
+
+            # the lo parts can't move |z| across 2 by any amount that matters
+            escaped = self._x[0]*self._x[0] + self._y[0]*self._y[0] >= 4.0
+            if trapped.any():
+                self._store(trapped, -1)
+                escaped &= ~trapped
+                self._store(escaped, k)
+                self._drop(trapped | escaped)
+            elif escaped.any():
+                self._retire(escaped, k)
+
+        # remaining pixels ran to the end of the kernel
+        self._store(np.ones(shape=self._index.shape, dtype=bool), end_point)
+        self._k = end_point
+
+        return work
+
+    def _gather_active(self):
+        # pixels still at the start of the kernel and not escaped
+        x = self._z.real
+        y = self._z.imag
+        index = np.flatnonzero((self._iteration == self._k) & (x*x + y*y < 4.0))
+        self._index = index
+
+        self._cx = (self._c.real[index], self._c_lo.real[index])
+        self._cy = (self._c.imag[index], self._c_lo.imag[index])
+        self._x = (x[index], self._z_lo.real[index])
+        self._y = (y[index], self._z_lo.imag[index])
+        self._sx = (self._z_saved.real[index], self._z_saved_lo.real[index])
+        self._sy = (self._z_saved.imag[index], self._z_saved_lo.imag[index])
+
+    def _step(self):
+        x = self._x
+        y = self._y
+        xx = multiply(x, x)
+        yy = multiply(y, y)
+        xy = multiply(x, y)
+        self._x = add(subtract(xx, yy), self._cx)
+        # doubling is exact
+        self._y = add((2.0*xy[0], 2.0*xy[1]), self._cy)
+
+    def _store(self, stopped: np.ndarray, k: int):
+        index = self._index[stopped]
+        self._z.real[index] = self._x[0][stopped]
+        self._z.imag[index] = self._y[0][stopped]
+        self._z_lo.real[index] = self._x[1][stopped]
+        self._z_lo.imag[index] = self._y[1][stopped]
+        self._z_saved.real[index] = self._sx[0][stopped]
+        self._z_saved.imag[index] = self._sy[0][stopped]
+        self._z_saved_lo.real[index] = self._sx[1][stopped]
+        self._z_saved_lo.imag[index] = self._sy[1][stopped]
+        self._iteration[index] = k
+
+    def _retire(self, stopped: np.ndarray, k: int):
+        # write back pixels that have stopped and drop them from the active set
+        self._store(stopped, k)
+        self._drop(stopped)
+
+    def _drop(self, stopped: np.ndarray):
+        keep = ~stopped
+        self._index = self._index[keep]
+        self._cx = (self._cx[0][keep], self._cx[1][keep])
+        self._cy = (self._cy[0][keep], self._cy[1][keep])
+        self._x = (self._x[0][keep], self._x[1][keep])
+        self._y = (self._y[0][keep], self._y[1][keep])
+        self._sx = (self._sx[0][keep], self._sx[1][keep])
+        self._sy = (self._sy[0][keep], self._sy[1][keep])
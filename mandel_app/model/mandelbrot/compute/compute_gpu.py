@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import math
-from typing import Generator
+from typing import Generator, Optional
 
 # import cupy as cp
 try:
@@ -22,6 +22,8 @@ class ComputeGpu(compute_xpu.ComputeXpu):
         self._c: cp.ndarray = cp.array([], dtype=cp.complex)
         self._z: cp.ndarray = cp.array([], dtype=cp.complex)
         self._iteration: cp.ndarray = cp.array([], dtype=cp.int32)
+        # iterations done by the latest kernel, each thread adds its own
+        self._work: cp.ndarray = cp.zeros(shape=(1,), dtype=cp.uint64)
 
         self._mandel_kernel: cp.RawKernel = self._load_mandel_kernel()
 
@@ -65,7 +67,8 @@ class ComputeGpu(compute_xpu.ComputeXpu):
                            z_in: cp.ndarray,
                            iteration_in: cp.ndarray,
                            start_iter: int,
-                           end_iter: int
+                           end_iter: int,
+                           z_saved_in: Optional[cp.ndarray] = None    # no cycle detection on the gpu
                            ) -> Generator[float, None, None]:
         self._request_size = c_in.size
         # print(f"request_size = {request_size}")
@@ -85,17 +88,15 @@ class ComputeGpu(compute_xpu.ComputeXpu):
         if self._request_size < self._correct_size:
             self._c[self._request_size:] = 1.0
             self._z[self._request_size:] = 1.0
-            self._iteration[self._request_size:] = 0
-        self._prev_total_iterations = cp.sum(self._iteration[:self._request_size])
+            # as trapped, so the padding threads don't iterate or add to work
+            self._iteration[self._request_size:] = -1
 
         # print(f"c.shape: {c.shape}")
         # print(f"cells: {cells}")
         # print(f"block_size: {self.block_size}")
         # print(f"total_blocks: {total_blocks}")
 
-        end_points = range(start_iter+self.iterations_per_kernel,
-                           end_iter+1,
-                           self.iterations_per_kernel)
+        end_points = self._end_points(start_iter, end_iter)
         for end_point in end_points:
             iterations_done = self._calculate_to(end_point)
             yield float(iterations_done)
@@ -108,13 +109,12 @@ class ComputeGpu(compute_xpu.ComputeXpu):
         z_in[:] = self._z[:self._request_size]
         iteration_in[:] = self._iteration[:self._request_size]
 
+    # a kernel can't be stopped once launched, so stopping waits for the one running
     def _calculate_to(self, end_point: int) -> int:
+        self._check_stop()
         end = cp.int32(end_point)
-        self._mandel_kernel((self._total_blocks,), (self._BLOCK_SIZE,), (self._c, self._z, self._iteration, end))
-        # approximation to the work done
-        return self._request_size * self.iterations_per_kernel
-        # full calculation code:
-        # new_total_iterations = cp.sum(self._iteration[:self._request_size])
-        # iterations_done = new_total_iterations - self._prev_total_iterations
-        # self._prev_total_iterations = new_total_iterations
-        # return iterations_done
+        self._work.fill(0)
+        self._mandel_kernel((self._total_blocks,), (self._BLOCK_SIZE,),
+                            (self._c, self._z, self._iteration, end, self._work))
+        # a single value back rather than summing the iteration array
+        return int(self._work[0])
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import math
-from typing import Generator, Optional, Union
+import threading
+import time
+from fractions import Fraction
+from typing import Generator, List, Optional, Tuple, Union
 
 import numpy as np
 # import cupy as cp
@@ -12,8 +15,9 @@ except ImportError:
 except AttributeError:
     cp = None
 
-from mandel_app import application
-from mandel_app.model.mandelbrot.compute import compute_xpu, compute_gpu, compute_cpu
+from mandel_app.model.mandelbrot import compute_statistics, mandel
+from mandel_app.model.mandelbrot.compute import compute_xpu, backends, buffer_arena, compute_config, interior, \
+    kernel_sizer, compute_double_double, compute_perturbation, reference_orbit
 
 if cp is None:
     xp_ndarray = np.ndarray
@@ -25,71 +29,653 @@ else:
 # compute does the actual calculation
 # Singleton
 class ComputeManager:
-    def __init__(self, max_iterations: int, early_stopping: bool = True):
+    _CONTINUING_BUFFERS = (
+        ("c", np.complex128),
+        ("z", np.complex128),
+        ("iteration", np.int32),
+        ("z_saved", np.complex128),
+        ("index", np.int64)
+    )
+    _LOW_BUFFERS = (
+        ("c_lo", np.complex128),
+        ("z_lo", np.complex128),
+        ("z_saved_lo", np.complex128)
+    )
+    # the float32 pass of mixed precision, iteration and index are the same as for float64
+    _SINGLE_BUFFERS = (
+        ("c32", np.complex64),
+        ("z32", np.complex64),
+        ("iteration", np.int32),
+        ("z_saved32", np.complex64),
+        ("index", np.int64)
+    )
+
+    def __init__(self,
+                 max_iterations: int,
+                 early_stopping: bool = True,
+                 config: Optional[compute_config.ComputeConfig] = None):
         self.max_iterations: int = max_iterations
         self.early_stopping: bool = early_stopping
         self.final_iteration: int = 0
-        self._compute: compute_xpu.ComputeXpu
-        self._has_cuda = application.Application.instance().has_cuda
-        if self._has_cuda:
-            self._compute = compute_gpu.ComputeGpu()
-        else:
-            self._compute = compute_cpu.ComputeCpu()
+        # also test the larger bulbs off the main cardioid before iterating
+        self.prefilter_bulbs: bool = True
+        self.statistics: compute_statistics.ComputeStatistics = compute_statistics.ComputeStatistics()
+        # Server decides early stopping for each square tile of this many pixels, so a busy area of the image
+        # doesn't hold up the quiet rest and a quiet image doesn't stop a small busy area, 0 for the whole request
+        # off by default: against early stopping off at 10000 and 100000 iterations on numba it was no less accurate
+        # than the whole request's test on the stock views, but no faster than with early stopping off
+        self.early_stop_tile_size: int = 0
+        # a tile has far fewer pixels than the request to go on, so it must be quiet for this many windows running
+        self.early_stop_tile_windows: int = 8
+        # seconds a job waited on is given before every request is finished early, see start_budget, 0.0 for none
+        self.time_budget: float = 0.0
+        # a stop request (Escape) finishes such a job early too, so what it has is kept rather than thrown away
+        self.finish_on_stop: bool = False
+        # perf_counter time the current job's budget runs out, None if it has no budget
+        self._deadline: Optional[float] = None
+        self._finish_requested: bool = False
+        # set from another thread to abandon the current job, passed on to each compute
+        # which then raises compute_xpu.Stopped out of compute_flat_array part way through a kernel
+        self.stop_token: Optional[threading.Event] = None
+        # working arrays for compute_flat_array, kept for the life of the manager
+        self._arena: buffer_arena.BufferArena = buffer_arena.BufferArena()
+        # iterations_per_kernel is adjusted as each job runs
+        self._kernel_sizer: kernel_sizer.KernelSizer = kernel_sizer.KernelSizer()
+
+        if config is not None:
+            self._kernel_sizer.initial_iterations = config.iterations_per_kernel
+
+        # configured but can't run on this machine, empty if none, shown with each result's statistics
+        self._unavailable_backend: str = ""
+        self.backend: backends.Backend = self._choose_backend("" if config is None else config.backend)
+        self._compute: compute_xpu.ComputeXpu = self.backend.create()
+        self._record_backend()
+
+        # trapped pixels also get the radius of a disk around them known to be inside the set, see interior_radius
+        self.interior_disks: bool = True
+        # for the latest request, c units, 0.0 where there is no disk, None if not found for this request
+        self.interior_radius: Optional[xp_ndarray] = None
+        # for the latest request, the pixels left at max_iterations without being found to stay in the set
+        # (as early stopping leaves them or when they reach it) so they can be resumed if it is raised:
+        # their positions in c, their z and the iteration they reached, None if not kept for this request
+        self.capped: Optional[Tuple[xp_ndarray, xp_ndarray, xp_ndarray]] = None
+
+        # for MandelJob's Mesh: only fill boxes that affine arithmetic proves, splitting the rest, see Mesh.certify
+        # with it on mesh_base_size can be raised for bigger fills without wrong pixels
+        self.certify_box_fills: bool = False
+        self.mesh_base_size: int = 14
+
+        # backends that track the derivative can stop pixels close to an attracting cycle as trapped
+        # long before the orbit lands back exactly, see cpu_pixel.do_pixel, 0.0 is off
+        # pays where much of the view is inside the set, costs on views mostly just outside it
+        # other backends ignore it, counted in statistics.near_return_skipped_pixels and shown in the status bar
+        self.near_return_tolerance: float = 0.0
+
+        # shallow zooms can be iterated in float32 first, on a backend that can, then any pixels in doubt in float64
+        # off by default, see compute_benchmark for whether it pays on this machine
+        self.mixed_precision: bool = False
+        # float32 counts at least this high, or differing from a neighbour's by more than the tolerance, are in doubt
+        self.single_trusted_iterations: int = 200
+        self.single_neighbour_tolerance: int = 2
+        # or whose |z|^2 at escape, or the step before, was within this fraction of 4, so could have gone the other way
+        self.single_escape_tolerance: float = 2.0**-10
+        # z of each pixel of the latest float32 pass, as it escaped for those that did
+        self._single_z: Optional[xp_ndarray] = None
+        self._single_sizer: kernel_sizer.KernelSizer = kernel_sizer.KernelSizer()
+
+        # zooms too deep for float64 are iterated in double-double, then deeper still by perturbation, see set_view
+        # each takes over once pixels are closer together than this many of the smallest steps the one before
+        # can take near the centre of the view
+        self.precision_margin: float = 4096.0
+        self.double_double: bool = True
+        self.perturbation: bool = True
+        # chosen for the current view: "float32", "float64", "double_double" or "perturbation"
+        self.precision: str = "float64"
+        # used in place of the choice for every view if set, for comparing them, see perturbation_benchmark
+        self.forced_precision: Optional[str] = None
+        # centre of the view as a double-double, hi and lo parts
+        self._centre: complex = complex(0.0, 0.0)
+        # of the current view, the distance between neighbouring pixels in c
+        self._size_per_gap: float = 0.0
+        self._centre_lo: complex = complex(0.0, 0.0)
+        self._double_double = compute_double_double.ComputeDoubleDouble()
+        self._double_double_sizer: kernel_sizer.KernelSizer = kernel_sizer.KernelSizer()
+        # most new references tried for glitched pixels in one request
+        self.max_references: int = 16
+        self._perturbation = compute_perturbation.ComputePerturbation()
+        self._perturbation_sizer: kernel_sizer.KernelSizer = kernel_sizer.KernelSizer()
+        # reference orbit at the centre of the current view if it is iterated by perturbation
+        self._reference: Optional[reference_orbit.ReferenceOrbit] = None
+
+    # array module the current backend works in
+    @property
+    def xp(self):
+        return self.backend.xp
 
     @property
     def has_cuda(self) -> bool:
-        return self._has_cuda
+        return self.backend.xp is not np
+
+    # requests for the current view need dc passed to compute_flat_array
+    @property
+    def uses_offsets(self) -> bool:
+        return self.precision in ("double_double", "perturbation")
+
+    # called at the start of each job with the view it is for, to choose the precision it is iterated in
+    # a perturbation view gets a reference orbit at its centre, kept while the centre and depth stay the same
+    def set_view(self, mandel_: mandel.Mandel):
+        self.precision = self._precision_for(mandel_)
+        self.statistics.precision = self.precision
+        real = mandel_.precise_centre.real
+        imag = mandel_.precise_centre.imag
+        self._centre = mandel_.centre
+        self._size_per_gap = mandel_.size_per_gap
+        self._centre_lo = complex(float(real - Fraction(self._centre.real)), float(imag - Fraction(self._centre.imag)))
+        if self.precision != "perturbation":
+            self._reference = None
+            return
+
+        # bits for the smallest offset with 64 to spare
+        precision_bits = 64 - math.floor(math.log2(mandel_.size_per_gap))
+        reference = self._reference
+        if reference is None or \
+                reference.real != real or \
+                reference.imag != imag or \
+                reference.precision_bits < precision_bits:
+            self._reference = reference_orbit.ReferenceOrbit(real, imag, precision_bits)
+            self.statistics.perturbation_references += 1
+
+    def _precision_for(self, mandel_: mandel.Mandel) -> str:
+        if self.forced_precision is not None:
+            return self.forced_precision
+        # pixel spacing in float64 steps at the centre, double-double has 53 more bits
+        magnitude = max(abs(mandel_.centre.real), abs(mandel_.centre.imag))
+        steps = mandel_.size_per_gap / math.ulp(magnitude)
+        if steps >= self.precision_margin:
+            if self.mixed_precision and "float32" in self.backend.precisions and \
+                    mandel_.size_per_gap / float(np.spacing(np.float32(magnitude))) >= self.precision_margin:
+                return "float32"
+            return "float64"
+        if self.double_double and (steps * 2.0**53 >= self.precision_margin or not self.perturbation):
+            return "double_double"
+        if self.perturbation:
+            return "perturbation"
+        return "float64"
+
+    # the named backend if it can run here, otherwise the most preferred that can
+    def _choose_backend(self, name: str) -> backends.Backend:
+        available = backends.available_backends()
+        self._unavailable_backend = "" if name in available else name
+        if name in available:
+            return available[name]
+        return next(iter(available.values()))
+
+    def _record_backend(self):
+        self.statistics.backend = self.backend.name
+        self.statistics.unavailable_backend = self._unavailable_backend
+
+    # only between jobs, such as once AutotuneJob has chosen one
+    def set_backend(self, name: str):
+        backend = self._choose_backend(name)
+        self._record_backend()
+        if backend.name == self.backend.name:
+            return
+        self._compute.shutdown()
+        self.backend = backend
+        self._compute = backend.create()
+        self._record_backend()
+        # speed measured on the previous backend doesn't apply
+        self._kernel_sizer = kernel_sizer.KernelSizer(initial_iterations=self._kernel_sizer.initial_iterations)
+
+    def shutdown(self):
+        self._compute.shutdown()
+        self._arena.release()
+
+    # called at the start of each job, compute_flat_array accumulates into statistics across requests
+    def reset_statistics(self):
+        self.statistics = compute_statistics.ComputeStatistics()
+        self._record_backend()
+        self._arena.reset_counts()
+        self._compute.reset_utilisation()
+
+    # region Finishing early
+    # called at the start of each job, 0.0 for no budget
+    # once time_budget seconds have passed, or request_finish is called, every request is cut short after its
+    # current kernel: pixels still going are left at max_iterations as early stopping leaves them
+    # and kept in capped, so the result can be refined later by resuming them
+    def start_budget(self, time_budget: float):
+        self._deadline = time.perf_counter() + time_budget if time_budget > 0.0 else None
+        self._finish_requested = False
+
+    def request_finish(self):
+        self._finish_requested = True
+
+    @property
+    def finishing(self) -> bool:
+        return self._finish_requested or (self._deadline is not None and time.perf_counter() >= self._deadline)
+    # endregion
 
     # input: a flat gpu array of c's to be calculated
     # output: a flat gpu array of the resulting iterations found
-    # early_stopping: if no pixels have stopped in the latest loop then stop
+    # if the backend fails the request is started again on the next available backend
+    # results are returned in the same array module as c even if the backend has changed
+    # dc: each c's offset from the view centre, which is used instead of c when uses_offsets
+    # cost: each c's predicted iteration count, for backends that order their work by it (Backend.orders_by_cost)
+    # tiles: each c's tile of the image, early stopping is then decided for each tile on its own
+    # resume: each c's z and the iteration it had reached, as capped, 0 to start from z = c
     def compute_flat_array(
             self,
             c: xp_ndarray,
-            early_stopping_iteration: Optional[int] = None
+            early_stopping_iteration: Optional[int] = None,
+            dc: Optional[xp_ndarray] = None,
+            cost: Optional[xp_ndarray] = None,
+            tiles: Optional[xp_ndarray] = None,
+            resume: Optional[Tuple[xp_ndarray, xp_ndarray]] = None
     ) -> Generator[float, None, xp_ndarray]:
-        if self._has_cuda:
-            xp = cp.get_array_module(c)
+        self.interior_radius = None
+        self.capped = None
+        if dc is not None and self.precision == "double_double":
+            iteration = yield from self._compute_double_double(self._to_module(dc, np), early_stopping_iteration)
+            return self._to_module(iteration, self._module_of(c))
+        elif dc is not None and self.precision == "perturbation":
+            iteration = yield from self._compute_perturbed(self._to_module(dc, np), early_stopping_iteration)
+            return self._to_module(iteration, self._module_of(c))
+
+        while True:
+            xp = self.xp
+            try:
+                # float32 unless the backend has fallen back to one that can't
+                if self.precision == "float32" and "float32" in self.backend.precisions:
+                    iteration = yield from self._compute_mixed(self._to_module(c, xp), early_stopping_iteration, xp)
+                else:
+                    iteration = yield from self._compute_resumed(self._to_module(c, xp),
+                                                                 early_stopping_iteration,
+                                                                 xp,
+                                                                 cost,
+                                                                 None if tiles is None else self._to_module(tiles, xp),
+                                                                 resume)
+            except compute_xpu.Stopped:
+                raise
+            except Exception as exception:
+                if not self._fall_back(exception):
+                    raise
+            else:
+                self.statistics.worker_utilisation = [round(utilisation, 3)
+                                                      for utilisation in self._compute.worker_utilisation()]
+                if self.interior_radius is not None:
+                    self.interior_radius = self._to_module(self.interior_radius, self._module_of(c))
+                if self.capped is not None:
+                    self.capped = tuple(self._to_module(part, self._module_of(c)) for part in self.capped)
+                return self._to_module(iteration, self._module_of(c))
+
+    @staticmethod
+    def _module_of(array: xp_ndarray):
+        if cp is None:
+            return np
+        else:
+            return cp.get_array_module(array)
+
+    def _to_module(self, array: xp_ndarray, xp) -> xp_ndarray:
+        if self._module_of(array) is xp:
+            return array
+        elif xp is np:
+            return cp.asnumpy(array)
         else:
-            xp = np
-        z = xp.copy(c)
-        # z = xp.zeros(shape=c.shape, dtype=xp.complex)
-        iteration = xp.zeros(shape=c.shape, dtype=xp.int32)
-        # early_stop = xp.zeros(shape=c.shape, dtype=xp.bool)
+            return xp.asarray(array)
+
+    # switch to the next available backend after the current one, False if there isn't one
+    def _fall_back(self, exception: Exception) -> bool:
+        available = list(backends.available_backends().values())
+        names = [backend.name for backend in available]
+        if self.backend.name in names:
+            remaining = available[names.index(self.backend.name) + 1:]
+        else:
+            remaining = available
+        if not remaining:
+            return False
+
+        print(f"compute backend {self.backend.name} failed: {exception!r}, falling back to {remaining[0].name}")
+        try:
+            self._compute.shutdown()
+        except Exception:
+            pass
+        self.backend = remaining[0]
+        self._compute = self.backend.create()
+        # speed measured on the failed backend doesn't apply
+        self._kernel_sizer = kernel_sizer.KernelSizer(initial_iterations=self._kernel_sizer.initial_iterations)
+        self.statistics.backend_fallbacks += 1
+        self._record_backend()
+        return True
+
+    # float64 from z = c, or resume's pixels from the iteration each had reached, a group for each iteration
+    # keeps capped and interior_radius for the whole request
+    def _compute_resumed(
+            self,
+            c: xp_ndarray,
+            early_stopping_iteration: Optional[int],
+            xp,
+            cost: Optional[xp_ndarray],
+            tiles: Optional[xp_ndarray],
+            resume: Optional[Tuple[xp_ndarray, xp_ndarray]]
+    ) -> Generator[float, None, xp_ndarray]:
+        if resume is None:
+            iteration = yield from self._compute_flat_array(c, early_stopping_iteration, xp,
+                                                            radii=self.interior_disks, cost=cost, tiles=tiles,
+                                                            keep_capped=True)
+            return iteration
+
+        z, reached = (self._to_module(part, xp) for part in resume)
+        iteration = xp.empty(shape=c.shape, dtype=xp.int32)
+        interior_radius = xp.zeros(shape=c.shape, dtype=xp.float64) if self.interior_disks else None
+        capped: List[Tuple[xp_ndarray, xp_ndarray, xp_ndarray]] = []
+        final_iteration = 0
+        for start_iter in sorted(int(start) for start in xp.unique(reached)):
+            group = xp.flatnonzero(reached == start_iter)
+            iteration[group] = yield from self._compute_flat_array(
+                c[group],
+                early_stopping_iteration,
+                xp,
+                start_iter=start_iter,
+                z_start=None if start_iter == 0 else z[group],
+                radii=self.interior_disks,
+                cost=None if cost is None else cost[self._to_module(group, self._module_of(cost))],
+                tiles=None if tiles is None else tiles[group],
+                keep_capped=True
+            )
+            final_iteration = max(final_iteration, self.final_iteration)
+            if self.interior_radius is not None:
+                interior_radius[group] = self.interior_radius
+            group_index, group_z, group_reached = self.capped
+            capped.append((group[group_index], group_z, group_reached))
+        self.final_iteration = final_iteration
+        self.interior_radius = interior_radius
+        self.capped = tuple(xp.concatenate(parts) for parts in zip(*capped))
+        return iteration
+
+    # region Mixed precision
+    # every pixel is iterated in float32, then only those whose result is in doubt again in float64
+    # known interior pixels are left out of both, they are max_iterations whatever the precision
+    def _compute_mixed(
+            self,
+            c: xp_ndarray,
+            early_stopping_iteration: Optional[int],
+            xp
+    ) -> Generator[float, None, xp_ndarray]:
+        known_interior = interior.known_interior(c, bulbs=self.prefilter_bulbs)
+        self.statistics.prefiltered_pixels += int(xp.count_nonzero(known_interior))
+        iteration = xp.full(shape=c.shape, fill_value=self.max_iterations, dtype=xp.int32)
+        positions = xp.flatnonzero(~known_interior)
+        single_c = c[positions]
+        single_iteration = yield from self._compute_flat_array(single_c,
+                                                               early_stopping_iteration,
+                                                               xp,
+                                                               sizer=self._single_sizer,
+                                                               single=True)
+        final_iteration = self.final_iteration
+        trapped = single_iteration == -1
+        single_iteration[trapped] = self.max_iterations
+
+        in_doubt = xp.flatnonzero(self._single_in_doubt(xp, single_c, single_iteration, trapped))
+        self.statistics.single_recomputed_pixels += int(in_doubt.size)
+        if in_doubt.size > 0:
+            # stop where the whole request did, a few slow pixels on their own would go on much longer
+            single_iteration[in_doubt] = yield from self._compute_flat_array(single_c[in_doubt],
+                                                                             final_iteration,
+                                                                             xp)
+        iteration[positions] = single_iteration
+        self.final_iteration = final_iteration
+        return iteration
+
+    # float32 rounding changes the count near the boundary of the set, where counts are high and change quickly
+    # so a pixel is in doubt if its count is high, or steps away from a neighbour's
+    # or it escaped so close to the escape radius that rounding could have moved the step it escaped on
+    # except for pixels trapped in a cycle, which attracts the orbit whatever the rounding
+    # neighbours are the pixels before and after in the request, which is in rows, if they are a pixel apart in c
+    # so not across the end of a row or a gap between the parts of the image requested
+    def _single_in_doubt(self, xp, c: xp_ndarray, iteration: xp_ndarray, trapped: xp_ndarray) -> xp_ndarray:
+        in_doubt = (iteration >= self.single_trusted_iterations) & ~trapped
+        adjacent = xp.abs(xp.diff(c)) < 1.5 * self._size_per_gap
+        steep = (xp.abs(xp.diff(iteration)) > self.single_neighbour_tolerance) & adjacent
+        in_doubt[1:] |= steep
+        in_doubt[:-1] |= steep
+        # with no neighbour either side there is nothing to compare against, such as down Mesh's vertical lines
+        alone = xp.ones(shape=iteration.shape, dtype=xp.bool_)
+        alone[1:] &= ~adjacent
+        alone[:-1] &= ~adjacent
+        in_doubt |= alone & ~trapped
+
+        # |z|^2 at escape, and as |z_n - c| = |z_n-1|^2 the step before, which escaped if it was 4 or more
+        escaped = (iteration < self.max_iterations) & ~trapped
+        z = self._single_z.astype(np.complex128)
+        tolerance = 4.0 * self.single_escape_tolerance
+        near_escape = (xp.abs(z.real * z.real + z.imag * z.imag - 4.0) < tolerance) | \
+                      (xp.abs(xp.abs(z - c) - 4.0) < tolerance)
+        in_doubt |= escaped & near_escape
+        return in_doubt
+    # endregion
+
+    # c as the double-double centre + dc, which float64 c has rounded
+    def _compute_double_double(
+            self,
+            dc: np.ndarray,
+            early_stopping_iteration: Optional[int]
+    ) -> Generator[float, None, np.ndarray]:
+        zero = np.zeros(shape=dc.shape, dtype=np.float64)
+        x, x_lo = compute_double_double.add((self._centre.real, self._centre_lo.real), (dc.real, zero))
+        y, y_lo = compute_double_double.add((self._centre.imag, self._centre_lo.imag), (dc.imag, zero))
+        iteration = yield from self._compute_flat_array(x + 1j*y,
+                                                        early_stopping_iteration,
+                                                        np,
+                                                        compute=self._double_double,
+                                                        sizer=self._double_double_sizer,
+                                                        c_lo=x_lo + 1j*y_lo)
+        return iteration
+
+    # region Perturbation
+    # deltas are iterated against the view's reference, then any pixels that glitched against new references
+    # pixels still glitched after max_references, or when finishing early, are reported as max_iterations
+    def _compute_perturbed(
+            self,
+            dc: np.ndarray,
+            early_stopping_iteration: Optional[int]
+    ) -> Generator[float, None, np.ndarray]:
+        iteration = yield from self._compute_against(self._reference, dc, early_stopping_iteration)
+        final_iteration = self.final_iteration
+
+        for _ in range(self.max_references):
+            glitched = np.flatnonzero(iteration == compute_perturbation.GLITCHED)
+            if glitched.size == 0:
+                break
+            if self.finishing:
+                self.statistics.unfinished_pixels += int(glitched.size)
+                break
+            self.statistics.glitched_pixels += int(glitched.size)
+
+            # the glitched pixel nearest the middle of them becomes the new reference, it can't glitch against itself
+            glitched_dc = dc[glitched]
+            new_dc = complex(glitched_dc[np.argmin(np.abs(glitched_dc - np.mean(glitched_dc)))])
+            reference = reference_orbit.ReferenceOrbit(self._reference.real + Fraction(new_dc.real),
+                                                       self._reference.imag + Fraction(new_dc.imag),
+                                                       self._reference.precision_bits)
+            self.statistics.perturbation_references += 1
+
+            iteration[glitched] = yield from self._compute_against(reference,
+                                                                   glitched_dc - new_dc,
+                                                                   early_stopping_iteration)
+            final_iteration = max(final_iteration, self.final_iteration)
+
+        unresolved = (iteration == compute_perturbation.GLITCHED)
+        self.statistics.unresolved_glitches += int(np.count_nonzero(unresolved))
+        iteration[unresolved] = self.max_iterations
+        self.final_iteration = final_iteration
+        return iteration
+
+    def _compute_against(
+            self,
+            reference: reference_orbit.ReferenceOrbit,
+            dc: np.ndarray,
+            early_stopping_iteration: Optional[int]
+    ) -> Generator[float, None, np.ndarray]:
+        self._perturbation.reference = reference
+        # iterations shared by every pixel are skipped using the series approximation
+        skip, delta = self._perturbation.series_approximation(dc, self.max_iterations - 1)
+        self.statistics.series_skipped_iterations = max(self.statistics.series_skipped_iterations, skip)
+        iteration = yield from self._compute_flat_array(dc,
+                                                        early_stopping_iteration,
+                                                        np,
+                                                        compute=self._perturbation,
+                                                        sizer=self._perturbation_sizer,
+                                                        start_iter=skip,
+                                                        z_start=delta)
+        return iteration
+    # endregion
+
+    # early_stopping: if no pixels have stopped in the latest loop then stop
+    # by default iterates c from z = c on the current backend
+    # double-double and perturbation pass their own compute and sizer
+    # single: iterated in float32 by the current backend, with its own sizer, c has already been prefiltered
+    # and trapped pixels are returned as -1
+    # radii: sets interior_radius for the pixels found trapped in a cycle
+    # cost: predicted iteration counts, passed on as the compute's cost_hint for the pixels still going
+    # tiles: tile ids, the pixels of a tile that has gone quiet are stopped while the other tiles keep going
+    # finishing: the pixels still going after the current kernel are stopped as if by early stopping
+    # keep_capped: sets capped for the pixels stopped still going
+    # double-double: c_lo is the lo part of c, compacted and passed to compute with the lo parts of z and z_saved
+    # perturbation: c is dc and z_start the deltas at start_iter
+    def _compute_flat_array(
+            self,
+            c: xp_ndarray,
+            early_stopping_iteration: Optional[int],
+            xp,
+            compute: Optional[compute_xpu.ComputeXpu] = None,
+            sizer: Optional[kernel_sizer.KernelSizer] = None,
+            start_iter: int = 0,
+            z_start: Optional[xp_ndarray] = None,
+            c_lo: Optional[xp_ndarray] = None,
+            single: bool = False,
+            radii: bool = False,
+            cost: Optional[xp_ndarray] = None,
+            tiles: Optional[xp_ndarray] = None,
+            keep_capped: bool = False
+    ) -> Generator[float, None, xp_ndarray]:
+        total_pixels = c.size
+        if compute is None:
+            compute = self._compute
+            compute.near_return_tolerance = self.near_return_tolerance
+            tracks_derivative = self.backend.tracks_derivative
+        else:
+            tracks_derivative = False
+        if self.near_return_tolerance > 0.0 and not tracks_derivative:
+            self.statistics.near_return_skipped_pixels += total_pixels
+        compute.stop_token = self.stop_token
+        if sizer is None:
+            sizer = self._kernel_sizer
+        iteration = xp.empty(shape=c.shape, dtype=xp.int32)
+        low = c_lo is not None
+        # position, c and z of each pixel trapped in a cycle, collected as they stop
+        cycles: List[Tuple[xp_ndarray, xp_ndarray, xp_ndarray]] = []
+        # position, z and iteration reached of each pixel stopped still going, if keep_capped
+        capped: List[Tuple[xp_ndarray, xp_ndarray, int]] = []
+
+        # the pixels still being iterated are kept compacted at the front of reused buffers
+        # index is the position of each one in c, for writing the result back
+        side = 0
+        buffers = self._continuing_buffers(xp, side, total_pixels, low, single)
+        continuing_c, continuing_z, continuing_iteration, continuing_z_saved, continuing_index = buffers[:5]
+        continuing_c[:] = c
+        continuing_z[:] = c if z_start is None else z_start
+        continuing_iteration.fill(start_iter)
+        # cycle detection state, compared against until replaced at each power of two iteration
+        continuing_z_saved[:] = continuing_z
+        continuing_index[:] = xp.arange(total_pixels)
+        if single:
+            self._single_z = self._arena.get("single_z", total_pixels, np.complex64, xp)
+        # c_lo, z_lo and z_saved_lo if any
+        low_buffers = buffers[5:]
+        for low_buffer in low_buffers:
+            low_buffer[:] = c_lo
+
+        known_interior: Optional[xp_ndarray] = None
+        if z_start is None and not low and not single:
+            # pixels in the main cardioid or a known bulb never escape, mark them as trapped so they are never iterated
+            known_interior = interior.known_interior(c, bulbs=self.prefilter_bulbs)
+            continuing_iteration[known_interior] = -1
+            self.statistics.prefiltered_pixels += int(xp.count_nonzero(known_interior))
 
         # print(early_stopping_iteration)
 
-        if self._has_cuda:
-            self._compute.iterations_per_kernel = 1000
+        if xp is not np:
             kernels_per_loop = 10
-            early_stop_tolerance: float = 0.0001
         else:
-            self._compute.iterations_per_kernel = 1000
             kernels_per_loop = 1
-            early_stop_tolerance: float = 0.0001
-        iterations_per_loop = self._compute.iterations_per_kernel * kernels_per_loop
+        # fraction of pixels that can escape in a loop of 1000 iterations per kernel and still stop early
+        # loops vary in length so escapes are counted over at least that many iterations before deciding
+        early_stop_tolerance: float = 0.0001
+        tolerance_iterations = 1000 * kernels_per_loop
+        window_iterations: int = 0
+        window_escaped: int = 0
+        # the same for each tile, if early stopping by tile
+        tile_count = 0 if tiles is None else int(tiles.max()) + 1
+        tile_pixels: Optional[xp_ndarray] = None
+        tile_window_escaped: Optional[xp_ndarray] = None
+        tile_quiet_windows: Optional[xp_ndarray] = None
+        if tiles is not None:
+            tile_pixels = xp.bincount(tiles, minlength=tile_count)
+            tile_window_escaped = xp.zeros(shape=(tile_count,), dtype=xp.int64)
+            tile_quiet_windows = xp.zeros(shape=(tile_count,), dtype=xp.int64)
 
-        total_pixels = c.size
-        pixel_tolerance = math.floor(early_stop_tolerance * total_pixels)
+        compute.iterations_per_kernel = sizer.start_request(total_pixels)
+        iterations_per_loop = compute.iterations_per_kernel * kernels_per_loop
 
         # first iteration different
-        start_iter = 0
-        end_iter = iterations_per_loop
+        end_iter = min(start_iter + iterations_per_loop, self.max_iterations)
         # print(f"c.shape {c.shape}")
         # print(f"{start_iter}->{end_iter}")
         # print(f"iteration_max = {self.max_iterations}")
         # print(f"all:\t{c.size}")
-        yield from self._compute.compute_iterations(c, z, iteration, start_iter, end_iter)
+        self._hint_cost(compute, cost, continuing_index)
+        seconds = yield from self._timed_compute_iterations(
+            compute,
+            continuing_c,
+            continuing_z,
+            continuing_iteration,
+            start_iter,
+            end_iter,
+            continuing_z_saved,
+            *low_buffers
+        )
+        if single:
+            self._single_z[continuing_index] = continuing_z
 
-        continuing = (iteration == end_iter)
-        if not xp.any(continuing):
-            iteration[iteration == -1] = self.max_iterations
+        still_continuing = self._arena.get("still_continuing", total_pixels, np.bool_, xp)
+        trapped = self._arena.get("trapped", total_pixels, np.bool_, xp)
+        xp.equal(continuing_iteration, end_iter, out=still_continuing)
+        # trapped, or glitched when iterating by perturbation
+        xp.less(continuing_iteration, 0, out=trapped)
+        count_still_continuing: int = int(xp.count_nonzero(still_continuing))
+        count_escaped: int = total_pixels - count_still_continuing - int(xp.count_nonzero(trapped))
+        if radii:
+            # prefiltered pixels were never iterated so aren't on their cycle
+            self._collect_cycles(xp, cycles, trapped if known_interior is None else trapped & ~known_interior,
+                                 continuing_c, continuing_z, continuing_index)
+        self._write_back(xp, iteration, continuing_iteration, continuing_index, single)
+        if count_still_continuing == 0:
+            self._update_buffer_statistics()
             self.final_iteration = end_iter
+            if radii:
+                self._find_interior_radius(xp, total_pixels, cycles)
+            if keep_capped:
+                self._set_capped(xp, capped)
             return iteration
 
-        continuing_c = c[continuing]
-        continuing_z = z[continuing]
-        continuing_iteration = iteration[continuing]
+        self._resize_kernels(compute, sizer, total_pixels, end_iter - start_iter, seconds,
+                             count_escaped, count_still_continuing)
+        iterations_per_loop = compute.iterations_per_kernel * kernels_per_loop
+
+        side = self._compact(xp, side, still_continuing, low, single)
+        buffers = self._continuing_buffers(xp, side, count_still_continuing, low, single)
+        continuing_c, continuing_z, continuing_iteration, continuing_z_saved, continuing_index = buffers[:5]
+        low_buffers = buffers[5:]
 
         # loop = 1
         # for multiplier in multipliers:
@@ -97,88 +683,261 @@ class ComputeManager:
             # for loop in range(1, loops):
             # start_iter = loop*iterations_per_loop
             # end_iter = min(start_iter + iterations_per_loop, self._max_iterations)
+            if self.finishing:
+                # every pixel in the buffers is still going
+                self.statistics.unfinished_pixels += count_still_continuing
+                if keep_capped:
+                    self._collect_capped(capped, xp.ones(shape=continuing_index.shape, dtype=xp.bool_),
+                                         continuing_z, continuing_index, end_iter)
+                continuing_iteration.fill(self.max_iterations)
+                self._write_back(xp, iteration, continuing_iteration, continuing_index, single)
+                break
             start_iter = end_iter
             end_iter = min(start_iter + iterations_per_loop, self.max_iterations)
             # print(f"{start_iter}->{end_iter}")
-            # count_continuing = xp.count_nonzero(continuing)
-            # print(f"count_continuing:\t{count_continuing}")
-
-            # print(f"continuing_c.shape: {continuing_c.shape}")
-            # print(f"continuing_z.shape: {continuing_z.shape}")
-            # print(f"continuing_iteration.shape: {continuing_iteration.shape}")
-            # print(f"continuing_c[0]: {continuing_c[100]}")
-            # print(f"continuing_z[0]: {continuing_z[100]}")
-            # next_z = continuing_z[100] * continuing_z[100] + continuing_c[100]
-            # print(f"next z: {next_z}")
-            # print(f"continuing_iteration[0]: {continuing_iteration[0]}")
-
-            yield from self._compute.compute_iterations(
+
+            self._hint_cost(compute, cost, continuing_index)
+            seconds = yield from self._timed_compute_iterations(
+                compute,
                 continuing_c,
                 continuing_z,
                 continuing_iteration,
                 start_iter,
-                end_iter
+                end_iter,
+                continuing_z_saved,
+                *low_buffers
             )
+            if single:
+                self._single_z[continuing_index] = continuing_z
 
-            # print(f"continuing_c[0]: {continuing_c[100]}")
-            # print(f"continuing_z[0]: {continuing_z[100]}")
-            # next_z = continuing_z[100] * continuing_z[100] + continuing_c[100]
-            # print(f"next z: {next_z}")
-            # print(f"continuing_iteration[0]: {continuing_iteration[0]}")
-
-            # print(f"xp.sum(continuing) after compute: {xp.sum(continuing)}")
-            # print(f"z.shape: {z.shape}")
-            # print(f"continuing.shape: {continuing.shape}")
-
-            # update main values
-            z[continuing] = continuing_z   # may not need this but almost instant
-            # noinspection PyTypeChecker
-            still_continuing: xp.ndarray = (continuing_iteration == end_iter)
-            trapped: xp.ndarray = (continuing_iteration == -1)
-            count_still_continuing: int = xp.count_nonzero(still_continuing)
-            count_stopped: int = xp.count_nonzero(xp.invert(still_continuing))
-            count_trapped: int = xp.count_nonzero(trapped)
+            count_continuing = continuing_iteration.size
+            still_continuing = self._arena.get("still_continuing", count_continuing, np.bool_, xp)
+            trapped = self._arena.get("trapped", count_continuing, np.bool_, xp)
+            xp.equal(continuing_iteration, end_iter, out=still_continuing)
+            xp.less(continuing_iteration, 0, out=trapped)
+            count_still_continuing: int = int(xp.count_nonzero(still_continuing))
+            count_stopped: int = count_continuing - count_still_continuing
+            count_trapped: int = int(xp.count_nonzero(trapped))
             count_escaped: int = count_stopped - count_trapped
+            if radii and count_trapped > 0:
+                self._collect_cycles(xp, cycles, trapped, continuing_c, continuing_z, continuing_index)
             # print(f"count_still_continuing:\t{count_still_continuing}")
             # print(f"count_stopped:\t{count_stopped}")
             # print(f"count_trapped:\t{count_trapped}")
             # print(f"count_escaped:\t{count_escaped}")
 
-            # print(f"loop={loop} has {xp.count_nonzero(still_continuing)} pixels continuing")
-
             # good time to stop if no more were eliminated, assume the rest run to max_iterations
             # added check that this isn't because all pixels are continuing as this indicates high base iteration space
-            iteration[continuing] = continuing_iteration
-            # if count_still_continuing == 0 or end_iter == self.max_iterations:
-            #     if count_still_continuing == 0:
-            #         print("0 continuing")
-            #     else:
-            #         print("max iterations")
-            #     break
-
+            window_iterations += end_iter - start_iter
+            window_escaped += count_escaped
+            window_complete = (window_iterations >= tolerance_iterations or end_iter == self.max_iterations)
+            pixel_tolerance = math.floor(early_stop_tolerance * total_pixels *
+                                         window_iterations / tolerance_iterations)
+            continuing_tiles: Optional[xp_ndarray] = None
+            if tiles is not None:
+                continuing_tiles = tiles[continuing_index]
+                tile_window_escaped += xp.bincount(continuing_tiles[~(still_continuing | trapped)],
+                                                   minlength=tile_count)
             if self.early_stopping:
                 if ((early_stopping_iteration is not None and
                      end_iter >= early_stopping_iteration)
                         or (early_stopping_iteration is None and
-                            count_escaped <= pixel_tolerance and
+                            tiles is None and
+                            window_complete and
+                            window_escaped <= pixel_tolerance and
                             count_still_continuing < total_pixels)):
                     # print("early_stopping")
-                    continuing[continuing] = still_continuing
-                    iteration[continuing] = self.max_iterations
+                    self._count_early_stopped(count_still_continuing, end_iter)
+                    if keep_capped:
+                        self._collect_capped(capped, still_continuing, continuing_z, continuing_index, end_iter)
+                    xp.copyto(continuing_iteration, self.max_iterations, where=still_continuing)
+                    self._write_back(xp, iteration, continuing_iteration, continuing_index, single)
                     break
 
-            continuing_c = continuing_c[still_continuing]
-            continuing_z = continuing_z[still_continuing]
-            continuing_iteration = continuing_iteration[still_continuing]
-            # print(f"xp.sum(continuing) before: {xp.sum(continuing)}")
-            continuing[continuing] = still_continuing
-            # loop += 1
+                if early_stopping_iteration is None and tiles is not None and window_complete:
+                    quiet = self._in_quiet_tiles(xp, continuing_tiles, still_continuing,
+                                                 tile_pixels, tile_window_escaped, tile_quiet_windows, tile_count,
+                                                 early_stop_tolerance * window_iterations / tolerance_iterations)
+                    count_quiet = int(xp.count_nonzero(quiet))
+                    if count_quiet > 0:
+                        self._count_early_stopped(count_quiet, end_iter)
+                        if keep_capped:
+                            self._collect_capped(capped, quiet, continuing_z, continuing_index, end_iter)
+                        continuing_iteration[quiet] = self.max_iterations
+                        still_continuing &= ~quiet
+                        count_still_continuing -= count_quiet
+
+            if window_complete:
+                window_iterations = 0
+                window_escaped = 0
+                if tile_window_escaped is not None:
+                    tile_window_escaped.fill(0)
 
-        # trapped = (iteration == -1)
-        # trapped_count = xp.count_nonzero(trapped)
-        # print(f"trapped: {trapped_count}")
-        iteration[iteration == -1] = self.max_iterations
+            self._write_back(xp, iteration, continuing_iteration, continuing_index, single)
+            if count_still_continuing == 0 or end_iter == self.max_iterations:
+                # nothing left to iterate, any still continuing are at max_iterations already
+                if keep_capped and count_still_continuing > 0:
+                    self._collect_capped(capped, still_continuing, continuing_z, continuing_index, end_iter)
+                break
 
+            self._resize_kernels(compute, sizer, count_continuing, end_iter - start_iter, seconds,
+                                 count_escaped, count_still_continuing)
+            iterations_per_loop = compute.iterations_per_kernel * kernels_per_loop
+            side = self._compact(xp, side, still_continuing, low, single)
+            buffers = self._continuing_buffers(xp, side, count_still_continuing, low, single)
+            continuing_c, continuing_z, continuing_iteration, continuing_z_saved, continuing_index = buffers[:5]
+            low_buffers = buffers[5:]
+            # loop += 1
+
+        self._update_buffer_statistics()
         # yield 1.0
         self.final_iteration = end_iter
+        if radii:
+            self._find_interior_radius(xp, total_pixels, cycles)
+        if keep_capped:
+            self._set_capped(xp, capped)
         return iteration
+
+    @staticmethod
+    def _collect_capped(capped: List[Tuple[xp_ndarray, xp_ndarray, int]],
+                        stopping: xp_ndarray,
+                        continuing_z: xp_ndarray,
+                        continuing_index: xp_ndarray,
+                        end_iter: int):
+        capped.append((continuing_index[stopping], continuing_z[stopping], end_iter))
+
+    def _set_capped(self, xp, capped: List[Tuple[xp_ndarray, xp_ndarray, int]]):
+        if capped:
+            self.capped = (xp.concatenate([index for index, _, _ in capped]),
+                           xp.concatenate([z for _, z, _ in capped]),
+                           xp.concatenate([xp.full(shape=index.shape, fill_value=end_iter, dtype=xp.int32)
+                                           for index, _, end_iter in capped]))
+        else:
+            self.capped = (xp.empty(shape=(0,), dtype=xp.int64),
+                           xp.empty(shape=(0,), dtype=xp.complex128),
+                           xp.empty(shape=(0,), dtype=xp.int32))
+
+    @staticmethod
+    def _collect_cycles(xp,
+                        cycles: List[Tuple[xp_ndarray, xp_ndarray, xp_ndarray]],
+                        trapped: xp_ndarray,
+                        continuing_c: xp_ndarray,
+                        continuing_z: xp_ndarray,
+                        continuing_index: xp_ndarray):
+        positions = xp.flatnonzero(trapped)
+        if positions.size > 0:
+            # copies, the buffers are reused
+            cycles.append((continuing_index[positions], continuing_c[positions], continuing_z[positions]))
+
+    def _find_interior_radius(self,
+                              xp,
+                              total_pixels: int,
+                              cycles: List[Tuple[xp_ndarray, xp_ndarray, xp_ndarray]]):
+        self.interior_radius = xp.zeros(shape=(total_pixels,), dtype=xp.float64)
+        if cycles:
+            index, c, z = (xp.concatenate(parts) for parts in zip(*cycles))
+            self.interior_radius[index] = interior.interior_radius(c, z)
+
+    # the pixels still continuing in tiles that have gone quiet, to be stopped as if at max_iterations
+    # as for the whole request: quiet when few enough pixels of the tile escaped over the window
+    # and not still continuing because none have stopped at all, as that indicates high base iteration space
+    # but only once that has held for early_stop_tile_windows windows running, counted in tile_quiet_windows
+    def _in_quiet_tiles(self,
+                        xp,
+                        continuing_tiles: xp_ndarray,
+                        still_continuing: xp_ndarray,
+                        tile_pixels: xp_ndarray,
+                        tile_window_escaped: xp_ndarray,
+                        tile_quiet_windows: xp_ndarray,
+                        tile_count: int,
+                        tolerance: float) -> xp_ndarray:
+        tile_still_continuing = xp.bincount(continuing_tiles[still_continuing], minlength=tile_count)
+        few_escaped = tile_window_escaped <= xp.floor(tolerance * tile_pixels)
+        tile_quiet_windows[...] = xp.where(few_escaped, tile_quiet_windows + 1, 0)
+        quiet = (tile_quiet_windows >= self.early_stop_tile_windows) & \
+                (tile_still_continuing > 0) & (tile_still_continuing < tile_pixels)
+        return still_continuing & quiet[continuing_tiles]
+
+    def _count_early_stopped(self, count: int, end_iter: int):
+        self.statistics.early_stopped_pixels += count
+        self.statistics.early_stopped_iterations += count * (self.max_iterations - end_iter)
+
+    # cost for the pixels about to be iterated, in the order they are compacted in
+    def _hint_cost(self, compute: compute_xpu.ComputeXpu, cost: Optional[xp_ndarray], continuing_index: xp_ndarray):
+        if cost is None or not self.backend.orders_by_cost:
+            compute.cost_hint = None
+        else:
+            compute.cost_hint = self._to_module(cost, np)[self._to_module(continuing_index, np)]
+
+    # as compute_iterations but returns the time spent computing, not counting time suspended at each yield
+    # gpu kernels run asynchronously so on the gpu this is only approximate
+    @staticmethod
+    def _timed_compute_iterations(compute: compute_xpu.ComputeXpu, *args) -> Generator[float, None, float]:
+        seconds: float = 0.0
+        start = time.perf_counter()
+        for iterations_done in compute.compute_iterations(*args):
+            seconds += time.perf_counter() - start
+            yield iterations_done
+            start = time.perf_counter()
+        seconds += time.perf_counter() - start
+        return seconds
+
+    @staticmethod
+    def _resize_kernels(compute: compute_xpu.ComputeXpu,
+                        sizer: kernel_sizer.KernelSizer,
+                        pixel_count: int,
+                        iterations: int,
+                        seconds: float,
+                        count_escaped: int,
+                        count_still_continuing: int):
+        compute.iterations_per_kernel = sizer.record_loop(
+            pixel_count, iterations, seconds, count_escaped, count_still_continuing)
+
+    # region Buffers
+    # two sets of continuing buffers, compaction copies the still continuing pixels from one set to the other
+    # low adds the lo parts for double-double, single has complex64 in place of complex128
+    def _continuing_buffers(self,
+                            xp,
+                            side: int,
+                            count: int,
+                            low: bool = False,
+                            single: bool = False) -> Tuple[xp_ndarray, ...]:
+        if single:
+            names = self._SINGLE_BUFFERS
+        elif low:
+            names = self._CONTINUING_BUFFERS + self._LOW_BUFFERS
+        else:
+            names = self._CONTINUING_BUFFERS
+        return tuple(self._arena.get(f"{name}_{side}", count, dtype, xp)
+                     for name, dtype in names)
+
+    def _compact(self, xp, side: int, still_continuing: xp_ndarray, low: bool = False, single: bool = False) -> int:
+        positions = xp.flatnonzero(still_continuing)
+        new_side = 1 - side
+        for source, destination in zip(self._continuing_buffers(xp, side, still_continuing.size, low, single),
+                                       self._continuing_buffers(xp, new_side, positions.size, low, single)):
+            if xp is np:
+                # positions are always in range, and mode="raise" would go via a temporary copy
+                np.take(source, positions, out=destination, mode="clip")
+            else:
+                xp.take(source, positions, out=destination)
+        return new_side
+
+    def _write_back(self,
+                    xp,
+                    iteration: xp_ndarray,
+                    continuing_iteration: xp_ndarray,
+                    continuing_index: xp_ndarray,
+                    keep_trapped: bool = False):
+        # trapped pixels are in the set so report them as max_iterations
+        # unless kept as -1 for the float32 pass to tell them apart
+        if not keep_trapped:
+            trapped = self._arena.get("trapped", continuing_iteration.size, np.bool_, xp)
+            xp.equal(continuing_iteration, -1, out=trapped)
+            xp.copyto(continuing_iteration, self.max_iterations, where=trapped)
+        iteration[continuing_index] = continuing_iteration
+
+    def _update_buffer_statistics(self):
+        self.statistics.buffer_allocations = self._arena.allocations
+        self.statistics.peak_buffer_bytes = self._arena.peak_bytes
+    # endregion
@@ -0,0 +1,84 @@
+from __future__ import annotations
+from typing import Generator, Optional
+
+import numpy as np
+# import numba
+try:
+    import numba
+except ImportError:
+    numba = None
+
+from mandel_app.model.mandelbrot.compute import compute_xpu, cpu_pixel
+
+if numba is not None:
+    # the same pixel loop ComputeCpu runs in its worker processes, compiled to machine code
+    _do_pixel = numba.njit(cpu_pixel.do_pixel, nogil=True, cache=True)
+
+    # one thread per core, each taking a share of the flat arrays, results written back in place
+    # returns the iterations done, summed as a reduction across the threads
+    @numba.njit(parallel=True, nogil=True, cache=True)
+    def _do_all(c: np.ndarray,
+                z: np.ndarray,
+                iteration: np.ndarray,
+                z_saved: np.ndarray,
+                end_iter: int,
+                near_return_squared: float) -> int:
+        work = 0
+        for i in numba.prange(c.size):
+            z[i], iteration[i], z_saved[i], done = _do_pixel(c[i], z[i], iteration[i], end_iter, z_saved[i],
+                                                             near_return_squared)
+            work += done
+        return work
+
+
+def is_available() -> bool:
+    return numba is not None
+
+
+# all cpu, jit compiled
+# requires numba, first use in a session includes compile time unless it is already in numba's cache
+class ComputeNumba(compute_xpu.ComputeXpu):
+    # pixels handed to the threads at a time, a stop is seen between them
+    stop_check_pixels: int = 65536
+
+    def __init__(self):
+        super().__init__()
+
+        self._c: np.ndarray = np.array([], dtype=np.complex128)
+        self._z: np.ndarray = np.array([], dtype=np.complex128)
+        self._iteration: np.ndarray = np.array([], dtype=np.int32)
+        self._z_saved: np.ndarray = np.array([], dtype=np.complex128)
+
+    # calculates iterations in parallel between start_iter and end_iter
+    # inputs: a flat c array and z starting values
+    # outputs: z ending values and iterations (set to end_iter if still going, -1 if trapped in a cycle)
+    def compute_iterations(self,
+                           c_in: np.ndarray,
+                           z_in: np.ndarray,
+                           iteration_in: np.ndarray,
+                           start_iter: int,
+                           end_iter: int,
+                           z_saved_in: Optional[np.ndarray] = None
+                           ) -> Generator[float, None, None]:
+        # work directly on the arrays passed in, results are written back in place
+        self._c = np.ascontiguousarray(c_in)
+        self._z = z_in
+        self._iteration = iteration_in
+        self._z_saved = np.copy(z_in) if z_saved_in is None else z_saved_in
+        self._request_size = iteration_in.size
+
+        end_points = self._end_points(start_iter, end_iter)
+        for end_point in end_points:
+            iterations_done = self._calculate_to(end_point)
+            yield float(iterations_done)
+
+    def _calculate_to(self, end_point: int) -> int:
+        near_return_squared = self.near_return_tolerance * self.near_return_tolerance
+        work = 0
+        for start in range(0, self._request_size, self.stop_check_pixels):
+            self._check_stop()
+            stop = start + self.stop_check_pixels
+            # slices are views, results are written back in place
+            work += int(_do_all(self._c[start:stop], self._z[start:stop], self._iteration[start:stop],
+                                self._z_saved[start:stop], end_point, near_return_squared))
+        return work
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import numpy as np
+# import numexpr as ne
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+from mandel_app.model.mandelbrot.compute import compute_numpy
+
+
+def is_available() -> bool:
+    return ne is not None
+
+
+# all cpu, vectorized and multithreaded
+# same lockstep loop as ComputeNumpy but each array expression is evaluated by numexpr,
+# which splits it into blocks across all cores and releases the GIL while it does so
+# operations are done in the same order as do_pixel so results are identical
+class ComputeNumexpr(compute_numpy.ComputeNumpy):
+    def __init__(self):
+        super().__init__()
+        # below this many active pixels the cost of each evaluate call outweighs the threading so use numpy
+        self.min_threaded_size: int = 32768
+
+    def _step(self):
+        if self._index.size < self.min_threaded_size:
+            super()._step()
+            return
+        # element-wise so safe to write over an input
+        ne.evaluate("2.0*x*y + cy", local_dict={"x": self._x, "y": self._y, "cy": self._cy}, out=self._y)
+        ne.evaluate("xx - yy + cx", local_dict={"xx": self._xx, "yy": self._yy, "cx": self._cx}, out=self._x)
+
+    def _trapped(self) -> np.ndarray:
+        if self._index.size < self.min_threaded_size:
+            return super()._trapped()
+        return ne.evaluate("(x == sx) & (y == sy)",
+                           local_dict={"x": self._x, "y": self._y, "sx": self._sx, "sy": self._sy})
+
+    def _escaped(self) -> np.ndarray:
+        if self._index.size < self.min_threaded_size:
+            return super()._escaped()
+        self._square()
+        return ne.evaluate("xx + yy >= 4.0", local_dict={"xx": self._xx, "yy": self._yy})
+
+    def _square(self):
+        if self._index.size < self.min_threaded_size:
+            super()._square()
+            return
+        # xx and yy are kept for the next step
+        ne.evaluate("x*x", local_dict={"x": self._x}, out=self._xx)
+        ne.evaluate("y*y", local_dict={"y": self._y}, out=self._yy)
@@ -0,0 +1,210 @@
+from __future__ import annotations
+from typing import Generator, Optional
+
+import numpy as np
+
+from mandel_app.model.mandelbrot.compute import compute_xpu
+
+
+# all cpu, vectorized
+# every continuing pixel is iterated in lockstep as whole numpy arrays, escaped pixels are masked out as it goes
+class ComputeNumpy(compute_xpu.ComputeXpu):
+    # iterations run between checks for escape, 1 checks every iteration
+    block_size: int = 16
+
+    def __init__(self):
+        super().__init__()
+
+        self._c: np.ndarray = np.array([], dtype=np.complex128)
+        self._z: np.ndarray = np.array([], dtype=np.complex128)
+        self._iteration: np.ndarray = np.array([], dtype=np.int32)
+        self._z_saved: np.ndarray = np.array([], dtype=np.complex128)
+
+        # iteration that all active pixels have reached (continuing pixels always share start_iter)
+        self._k: int = 0
+        # iterations done in the kernel so far, one for each pixel for each step it keeps
+        self._work: int = 0
+
+        # active pixels: their position in the request and their state split into real and imaginary parts
+        self._index: np.ndarray = np.array([], dtype=np.int64)
+        self._cx: np.ndarray = np.array([], dtype=np.float64)
+        self._cy: np.ndarray = np.array([], dtype=np.float64)
+        self._x: np.ndarray = np.array([], dtype=np.float64)
+        self._y: np.ndarray = np.array([], dtype=np.float64)
+        self._xx: np.ndarray = np.array([], dtype=np.float64)
+        self._yy: np.ndarray = np.array([], dtype=np.float64)
+        self._sx: np.ndarray = np.array([], dtype=np.float64)
+        self._sy: np.ndarray = np.array([], dtype=np.float64)
+
+    # calculates iterations in parallel between start_iter and end_iter
+    # inputs: a flat c array and z starting values
+    # outputs: z ending values and iterations (set to end_iter if still going, -1 if trapped in a cycle)
+    def compute_iterations(self,
+                           c_in: np.ndarray,
+                           z_in: np.ndarray,
+                           iteration_in: np.ndarray,
+                           start_iter: int,
+                           end_iter: int,
+                           z_saved_in: Optional[np.ndarray] = None
+                           ) -> Generator[float, None, None]:
+        # work directly on the arrays passed in, results are written back in place
+        self._c = c_in
+        self._z = z_in
+        self._iteration = iteration_in
+        self._z_saved = np.copy(z_in) if z_saved_in is None else z_saved_in
+        self._request_size = iteration_in.size
+        self._k = start_iter
+
+        end_points = self._end_points(start_iter, end_iter)
+        for end_point in end_points:
+            iterations_done = self._calculate_to(end_point)
+            yield float(iterations_done)
+
+    def _calculate_to(self, end_point: int) -> int:
+        # same loop as cpu_pixel.do_pixel but over arrays, a block of iterations at a time
+        self._gather_active()
+        self._work = 0
+
+        k = self._k
+        # pixels that escape in a block carry on to overflow before they are found
+        with np.errstate(over="ignore", invalid="ignore"):
+            while self._index.size > 0 and k < end_point:
+                # a block at a time so a stop is seen within block_size steps
+                self._check_stop()
+                k = self._block(k, min(k + self.block_size, end_point), end_point)
+
+        # remaining pixels ran to the end of the kernel
+        self._store(np.ones(shape=self._index.shape, dtype=bool), end_point)
+        self._k = end_point
+        return self._work
+
+    # iterates from k to block_end with no checks except that x has come back to the saved point,
+    # then pixels that escaped or might have been trapped go back to the start of the block and are iterated
+    # again checking every iteration, so they stop exactly where do_pixel would
+    def _block(self, k: int, block_end: int, end_point: int) -> int:
+        start_k = k
+        start = (self._index, self._cx, self._cy, np.copy(self._x), np.copy(self._y), np.copy(self._xx),
+                 np.copy(self._yy), np.copy(self._sx), np.copy(self._sy))
+        returned = np.zeros(shape=self._index.shape, dtype=bool)
+        back = np.empty(shape=self._index.shape, dtype=bool)
+        for k in range(start_k + 1, block_end + 1):
+            self._step()
+            self._square()
+            # trapped needs y back too, x alone is enough to say which to check
+            np.equal(self._x, self._sx, out=back)
+            returned |= back
+            if k & (k - 1) == 0:
+                np.copyto(self._sx, self._x)
+                np.copyto(self._sy, self._y)
+
+        # once |z| is past 2 it only grows, or overflows to inf or nan, so escaped is anything not under 4
+        stopped = ~(self._xx + self._yy < 4.0) | returned
+        count_stopped = int(np.count_nonzero(stopped))
+        # the block's iterations count only for pixels that keep them, replaying counts its own
+        self._work += (self._index.size - count_stopped) * (block_end - start_k)
+        if count_stopped > 0:
+            self._replay(stopped, start, start_k, block_end, end_point)
+        return block_end
+
+    def _replay(self, stopped: np.ndarray, start: tuple, start_k: int, block_end: int, end_point: int):
+        block = (self._index, self._cx, self._cy, self._x, self._y, self._xx, self._yy, self._sx, self._sy)
+        self._index, self._cx, self._cy, self._x, self._y, self._xx, self._yy, self._sx, self._sy = \
+            (array[stopped] for array in start)
+        self._checked_steps(start_k, block_end, end_point)
+
+        # any left didn't stop after all, they are where the block left them
+        left = self._index
+        self._index, self._cx, self._cy, self._x, self._y, self._xx, self._yy, self._sx, self._sy = block
+        # index stays in order as pixels are only ever dropped
+        stopped[np.searchsorted(self._index, left)] = False
+        self._drop(stopped)
+
+    # as do_pixel: checks for a cycle and for escape after every iteration
+    def _checked_steps(self, k: int, block_end: int, end_point: int):
+        while self._index.size > 0 and k < block_end:
+            self._step()
+            k += 1
+            self._work += self._index.size
+
+            # Brent-style cycle detection: back at the point saved at the last power of two so can never escape
+            trapped = self._trapped()
+            if k & (k - 1) == 0:
+                np.copyto(self._sx, self._x)
+                np.copyto(self._sy, self._y)
+
+            if k == end_point:
+                if trapped.any():
+                    self._retire(trapped, -1)
+                break
+
+            escaped = self._escaped()
+            if trapped.any():
+                self._store(trapped, -1)
+                escaped &= ~trapped
+                self._store(escaped, k)
+                self._drop(trapped | escaped)
+            elif escaped.any():
+                self._retire(escaped, k)
+
+    def _gather_active(self):
+        # pixels still at the start of the kernel and not escaped
+        x = self._z.real
+        y = self._z.imag
+        xx = x * x
+        yy = y * y
+        self._index = np.flatnonzero((self._iteration == self._k) & (xx + yy < 4.0))
+
+        self._cx = self._c.real[self._index]
+        self._cy = self._c.imag[self._index]
+        self._x = x[self._index]
+        self._y = y[self._index]
+        self._xx = xx[self._index]
+        self._yy = yy[self._index]
+        self._sx = self._z_saved.real[self._index]
+        self._sy = self._z_saved.imag[self._index]
+
+    def _step(self):
+        # y = 2*x*y + cy (doubling is exact so same result as do_pixel without a temporary)
+        self._y *= self._x
+        self._y *= 2.0
+        self._y += self._cy
+        # x = xx - yy + cx
+        np.subtract(self._xx, self._yy, out=self._x)
+        self._x += self._cx
+
+    def _trapped(self) -> np.ndarray:
+        return (self._x == self._sx) & (self._y == self._sy)
+
+    def _escaped(self) -> np.ndarray:
+        self._square()
+        return self._xx + self._yy >= 4.0
+
+    def _square(self):
+        # xx and yy are kept for the next step
+        np.multiply(self._x, self._x, out=self._xx)
+        np.multiply(self._y, self._y, out=self._yy)
+
+    def _store(self, stopped: np.ndarray, k: int):
+        index = self._index[stopped]
+        self._z.real[index] = self._x[stopped]
+        self._z.imag[index] = self._y[stopped]
+        self._z_saved.real[index] = self._sx[stopped]
+        self._z_saved.imag[index] = self._sy[stopped]
+        self._iteration[index] = k
+
+    def _retire(self, stopped: np.ndarray, k: int):
+        # write back pixels that have stopped and drop them from the active set
+        self._store(stopped, k)
+        self._drop(stopped)
+
+    def _drop(self, stopped: np.ndarray):
+        keep = ~stopped
+        self._index = self._index[keep]
+        self._cx = self._cx[keep]
+        self._cy = self._cy[keep]
+        self._x = self._x[keep]
+        self._y = self._y[keep]
+        self._xx = self._xx[keep]
+        self._yy = self._yy[keep]
+        self._sx = self._sx[keep]
+        self._sy = self._sy[keep]
@@ -0,0 +1,174 @@
+from __future__ import annotations
+from typing import Generator, Optional, Tuple
+
+import numpy as np
+
+from mandel_app.model.mandelbrot.compute import compute_xpu, reference_orbit
+
+# iteration value for a pixel whose delta can no longer be trusted, it needs iterating again against a new reference
+GLITCHED = -2
+
+
+# all cpu, vectorized, for zooms too deep for c to be held as float64
+# one reference orbit is iterated at high precision (ReferenceOrbit), each pixel only iterates its difference from it
+#   delta_n+1 = 2*z_n*delta_n + delta_n^2 + dc
+# c_in is dc, each pixel's offset from the reference, and z_in is delta, so ComputeManager can compact them as usual
+# no cycle detection: at depth the full z of neighbouring pixels round to the same float64 values
+class ComputePerturbation(compute_xpu.ComputeXpu):
+    # full z this much smaller than the reference's means the delta has lost its precision (Pauldelbrot's test)
+    glitch_tolerance: float = 1e-3
+    # the series is used while its cubic term is less than this fraction of its linear term for every pixel
+    series_tolerance: float = 1e-12
+
+    def __init__(self):
+        super().__init__()
+        self.reference: Optional[reference_orbit.ReferenceOrbit] = None
+
+        self._dc_in: np.ndarray = np.array([], dtype=np.complex128)
+        self._delta_in: np.ndarray = np.array([], dtype=np.complex128)
+        self._iteration: np.ndarray = np.array([], dtype=np.int32)
+
+        # iteration that all active pixels have reached (continuing pixels always share start_iter)
+        self._k: int = 0
+
+        # active pixels: their position in the request and their state
+        self._index: np.ndarray = np.array([], dtype=np.int64)
+        self._dc: np.ndarray = np.array([], dtype=np.complex128)
+        self._delta: np.ndarray = np.array([], dtype=np.complex128)
+
+    # how many iterations every pixel can skip, and their deltas at that iteration
+    # skips no further than max_skip, nor past where any pixel could have escaped
+    def series_approximation(self, dc: np.ndarray, max_skip: int) -> Tuple[int, np.ndarray]:
+        reference = self.reference
+        if dc.size == 0 or max_skip <= 0:
+            return 0, np.copy(dc)
+        radius = float(np.max(np.abs(dc)))
+        if radius == 0.0:
+            return 0, np.copy(dc)
+        log_radius = np.log(radius)
+
+        checked = 0
+        skip = 0
+        while True:
+            reference.extend_to(min(checked + reference.chunk, max_skip))
+            count = reference.values.size
+            with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                # in logs as radius^3 underflows long before dc does
+                log_a = np.log(np.abs(reference.a[checked:count])) + log_radius
+                log_b = np.log(np.abs(reference.b[checked:count])) + 2.0*log_radius
+                log_c = np.log(np.abs(reference.c[checked:count])) + 3.0*log_radius
+                accurate = log_c - log_a <= np.log(self.series_tolerance)
+                # bound on |z| for every pixel, so none can have escaped before the skip
+                bounded = np.abs(reference.values[checked:count]) + \
+                    np.exp(log_a) + np.exp(log_b) + 2.0*np.exp(log_c) < 2.0
+                valid = accurate & bounded
+
+            if not valid.all():
+                skip = checked + int(np.argmin(valid)) - 1
+                break
+            skip = count - 1
+            if count - 1 >= max_skip or reference.complete:
+                break
+            checked = count
+
+        skip = max(0, min(skip, max_skip))
+        a = reference.a[skip]
+        b = reference.b[skip]
+        c = reference.c[skip]
+        delta = ((c*dc + b)*dc + a)*dc
+        return skip, delta
+
+    # calculates iterations in parallel between start_iter and end_iter
+    # inputs: a flat dc array and delta starting values
+    # outputs: delta ending values and iterations (set to end_iter if still going, GLITCHED if it needs a new reference)
+    def compute_iterations(self,
+                           c_in: np.ndarray,
+                           z_in: np.ndarray,
+                           iteration_in: np.ndarray,
+                           start_iter: int,
+                           end_iter: int,
+                           z_saved_in: Optional[np.ndarray] = None
+                           ) -> Generator[float, None, None]:
+        # work directly on the arrays passed in, results are written back in place
+        self._dc_in = c_in
+        self._delta_in = z_in
+        self._iteration = iteration_in
+        self._request_size = iteration_in.size
+        self._k = start_iter
+
+        end_points = self._end_points(start_iter, end_iter)
+        for end_point in end_points:
+            iterations_done = self._calculate_to(end_point)
+            yield float(iterations_done)
+
+    def _calculate_to(self, end_point: int) -> int:
+        self.reference.extend_to(end_point)
+        values = self.reference.values
+        # a pixel can't be stepped past the last value, which is where the reference escaped if it has
+        last = values.size - 1
+        glitch_tolerance_squared = self.glitch_tolerance * self.glitch_tolerance
+        self._gather_active(values)
+
+        k = self._k
+        # iterations done, one for each pixel still active at each step
+        work = 0
+        while self._index.size > 0:
+            self._check_stop()
+            if k >= last:
+                # outlived the reference
+                self._retire(np.ones(shape=self._index.shape, dtype=bool), GLITCHED)
+                break
+
+            self._delta *= self._delta + 2.0*values[k]
+            self._delta += self._dc
+            k += 1
+            work += self._index.size
+
+            reference_z = values[k]
+            z = self._delta + reference_z
+            magnitude = z.real*z.real + z.imag*z.imag
+            reference_magnitude = reference_z.real*reference_z.real + reference_z.imag*reference_z.imag
+            glitched = magnitude < glitch_tolerance_squared * reference_magnitude
+
+            if k == end_point:
+                if glitched.any():
+                    self._retire(glitched, GLITCHED)
+                break
+
+            escaped = magnitude >= 4.0
+            if glitched.any():
+                glitched &= ~escaped
+                self._store(glitched, GLITCHED)
+                self._store(escaped, k)
+                self._drop(glitched | escaped)
+            elif escaped.any():
+                self._retire(escaped, k)
+
+        # remaining pixels ran to the end of the kernel
+        self._store(np.ones(shape=self._index.shape, dtype=bool), end_point)
+        self._k = end_point
+
+        return work
+
+    def _gather_active(self, values: np.ndarray):
+        # pixels still at the start of the kernel and not escaped
+        z = self._delta_in + values[self._k]
+        self._index = np.flatnonzero((self._iteration == self._k) & (z.real*z.real + z.imag*z.imag < 4.0))
+        self._dc = self._dc_in[self._index]
+        self._delta = self._delta_in[self._index]
+
+    def _store(self, stopped: np.ndarray, k: int):
+        index = self._index[stopped]
+        self._delta_in[index] = self._delta[stopped]
+        self._iteration[index] = k
+
+    def _retire(self, stopped: np.ndarray, k: int):
+        # write back pixels that have stopped and drop them from the active set
+        self._store(stopped, k)
+        self._drop(stopped)
+
+    def _drop(self, stopped: np.ndarray):
+        keep = ~stopped
+        self._index = self._index[keep]
+        self._dc = self._dc[keep]
+        self._delta = self._delta[keep]
@@ -1,6 +1,7 @@
 from __future__ import annotations
 import abc
-from typing import Generator, Union
+import threading
+from typing import Generator, List, Optional, Union
 
 import numpy as np
 # import cupy as cp
@@ -17,16 +18,29 @@ else:
     xp_ndarray = Union[np.ndarray, cp.ndarray]
 
 
+# raised out of compute_iterations once stop_token is set, the request's results are then not to be used
+class Stopped(Exception):
+    pass
+
+
 # could be gpu or cpu but not both
 class ComputeXpu(abc.ABC):
     def __init__(self):
         self.iterations_per_kernel: int = 0
+        # engines that track the derivative (Backend.tracks_derivative) use this to find trapped pixels early
+        # see cpu_pixel.do_pixel, 0.0 is off
+        self.near_return_tolerance: float = 0.0
+        # engines that order their work (Backend.orders_by_cost) start the pixels expected to take longest first
+        # a predicted iteration count for each pixel of the next compute_iterations call, None if there isn't one
+        self.cost_hint: Optional[np.ndarray] = None
+        # set from another thread to stop, checked between chunks of work well inside a kernel, see _check_stop
+        self.stop_token: Optional[threading.Event] = None
         self._request_size: int = 0
-        self._prev_total_iterations: int = 0
 
     # calculates iterations in parallel between start_iter and end_iter
     # inputs: a flat c gpu array and z starting values
-    # outputs: z ending values and iterations (set to end_iter if still going)
+    # outputs: z ending values and iterations (set to end_iter if still going, -1 if trapped in a cycle)
+    # z_saved: per-pixel cycle detection state carried between calls, if the engine does cycle detection
 
     @abc.abstractmethod
     def compute_iterations(self,
@@ -34,10 +48,38 @@ class ComputeXpu(abc.ABC):
                            z_in: xp_ndarray,
                            iteration_in: xp_ndarray,
                            start_iter: int,
-                           end_iter: int
+                           end_iter: int,
+                           z_saved_in: Optional[xp_ndarray] = None
                            ) -> Generator[float, None, None]:
         pass
 
     @abc.abstractmethod
     def _calculate_to(self, end_point: int) -> int:
         pass
+
+    # end of each kernel from start_iter to end_iter
+    # the last kernel is short if iterations_per_kernel doesn't divide into the range
+    def _end_points(self, start_iter: int, end_iter: int) -> List[int]:
+        end_points = list(range(start_iter+self.iterations_per_kernel, end_iter, self.iterations_per_kernel))
+        if end_iter > start_iter:
+            end_points.append(end_iter)
+        return end_points
+
+    def _stop_requested(self) -> bool:
+        return self.stop_token is not None and self.stop_token.is_set()
+
+    def _check_stop(self):
+        if self._stop_requested():
+            raise Stopped()
+
+    # fraction of the time each worker process was busy while there was work, since reset_utilisation
+    # empty for engines without worker processes
+    def worker_utilisation(self) -> List[float]:
+        return []
+
+    def reset_utilisation(self):
+        pass
+
+    # release any long-lived resources such as worker processes
+    def shutdown(self):
+        pass
@@ -1,21 +1,98 @@
-from typing import List
+from typing import Dict, Tuple
+import os
+import time
+from multiprocessing import shared_memory
 
+import numpy as np
+# numba is optional, register_jitable lets numba compile calls to a function from jitted code
+try:
+    from numba.extending import register_jitable
+except ImportError:
+    def register_jitable(function):
+        return function
 
+# Newton steps tried on a candidate cycle before giving up on it
+_NEWTON_STEPS = 16
+
+# shared memory attached by this worker process, kept open between calls
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def _attach(names: Tuple[str, ...]):
+    # ComputeCpu creates new blocks when it needs more room, so let go of any old ones
+    if any(name not in _attached for name in names):
+        for shm in _attached.values():
+            shm.close()
+        _attached.clear()
+        for name in names:
+            _attached[name] = shared_memory.SharedMemory(name=name)
+
+
+# iterates the pixels at order[start:stop], ComputeCpu deals out the order
+# returns this worker's process id and the seconds it was busy, for ComputeCpu's utilisation,
+# and the iterations done
+# gives up part way through once ComputeCpu sets the stop flag, the results are then not used
+def do_range(names: Tuple[str, str, str, str, str, str],
+             capacity: int,
+             start: int,
+             stop: int,
+             end_iter: int,
+             near_return_squared: float = 0.0) -> Tuple[int, float, int]:
+    began = time.perf_counter()
+    _attach(names)
+    c_name, z_name, iteration_name, z_saved_name, order_name, stop_name = names
+    c = np.ndarray(shape=(capacity,), dtype=np.complex128, buffer=_attached[c_name].buf)
+    z = np.ndarray(shape=(capacity,), dtype=np.complex128, buffer=_attached[z_name].buf)
+    iteration = np.ndarray(shape=(capacity,), dtype=np.int32, buffer=_attached[iteration_name].buf)
+    z_saved = np.ndarray(shape=(capacity,), dtype=np.complex128, buffer=_attached[z_saved_name].buf)
+    order = np.ndarray(shape=(capacity,), dtype=np.int64, buffer=_attached[order_name].buf)
+    stop_flag = np.ndarray(shape=(1,), dtype=np.int8, buffer=_attached[stop_name].buf)
+
+    work = 0
+    for i in order[start:stop].tolist():
+        if stop_flag[0]:
+            break
+        z[i], iteration[i], z_saved[i], done = do_pixel(complex(c[i]),
+                                                        complex(z[i]),
+                                                        int(iteration[i]),
+                                                        end_iter,
+                                                        complex(z_saved[i]),
+                                                        near_return_squared)
+        work += done
+    return os.getpid(), time.perf_counter() - began, work
+
+
+# z_saved is the point the orbit is compared against for cycle detection (Brent-style)
+# it is replaced every time the iteration count reaches a power of two,
+# so only this one point has to be carried from one call to the next
+# near_return_squared > 0: also tracks dz, the derivative of the orbit since the last saved point (or the start
+# of the call), and when the orbit comes back within sqrt(near_return_squared) of that point with |dz| < 1
+# checks for an attracting cycle there, trapped as soon as one is found rather than when rounding lands it exactly
+# also returns the iterations done, which can't be told from iterations once it is -1 for trapped
 def do_pixel(c: complex,
              z: complex,
              iterations: int,
-             end_iter: int):
-    prev_x: List[float] = []
-    prev_y: List[float] = []
-    # store_from: int = end_iter - 50
-
+             end_iter: int,
+             z_saved: complex,
+             near_return_squared: float = 0.0):
     k: int = iterations
     cx: float = c.real
     cy: float = c.imag
     x: float = z.real
     y: float = z.imag
+    sx: float = z_saved.real
+    sy: float = z_saved.imag
     xx: float = x * x
     yy: float = y * y
+    track: bool = near_return_squared > 0.0
+    # return point, steps since it, dz and whether it has already been checked
+    rx: float = x
+    ry: float = y
+    steps: int = 0
+    dx: float = 1.0
+    dy: float = 0.0
+    checked: bool = False
+    done: int = 0
     # x2: float # x * 2.0
     # cont: bool = k < end_iter and xx + yy < 4.0
     cont: bool = \
@@ -24,34 +101,83 @@ def do_pixel(c: complex,
         xx + yy < 4.0
 
     while cont:
-        # slot = (k - iterations) % 10
-        # # print(slot)
-        # if k >= store_from:
-        prev_x.append(x)
-        prev_y.append(y)
-
+        if track:
+            # dz = 2*z*dz, with z before the step
+            t = 2.0*(x*dx - y*dy)
+            dy = 2.0*(x*dy + y*dx)
+            dx = t
+            steps += 1
         y = 2*x*y + cy
         # x2 = x * 2.0
         # y = __fma_rn(x2, y, cy)
         x = xx - yy + cx
         k += 1
+        done += 1
 
-        if k == end_iter:
+        if x == sx and y == sy:
+            # back at an earlier point of the orbit so it is periodic and can never escape
+            k = -1
             cont = False
-        # if cont and x in prev_x:
-        #     if (x, y) in zip(prev_x, prev_y):
-        #         k = -1
-        #         cont = False
-        if cont:
-            xx = x * x
-            yy = y * y
-            cont = xx + yy < 4.0
-
-    if k == end_iter:
-        if x in prev_x:
-            if (x, y) in zip(prev_x, prev_y):
+        elif track and not checked and \
+                (x - rx)*(x - rx) + (y - ry)*(y - ry) < near_return_squared and dx*dx + dy*dy < 1.0:
+            # close to where it was and contracting, once per return point as the check costs a few periods
+            checked = True
+            multiplier_squared = cycle_multiplier_squared(c, complex(x, y), steps)
+            if 0.0 <= multiplier_squared < 1.0:
+                # an attracting cycle, so c is inside the set: the orbit of 0 is attracted to it and never escapes
                 k = -1
+                cont = False
+            elif multiplier_squared >= 1.0:
+                # lingering by a repelling cycle, outside the set but near it, more checks would find the same
+                track = False
+        if cont:
+            if k & (k - 1) == 0:
+                sx = x
+                sy = y
+                if track:
+                    rx = x
+                    ry = y
+                    steps = 0
+                    dx = 1.0
+                    dy = 0.0
+                    checked = False
+            if k == end_iter:
+                cont = False
+            else:
+                xx = x * x
+                yy = y * y
+                cont = xx + yy < 4.0
 
     z = complex(x, y)
+    z_saved = complex(sx, sy)
     iterations = k
-    return z, iterations
+    return z, iterations, z_saved, done
+
+
+# |multiplier|^2 of the cycle of the given period (or a divisor of it) near z, -1.0 if there isn't one
+# the cycle point is found by Newton's method on f^period(w) - w = 0
+@register_jitable
+def cycle_multiplier_squared(c: complex, z: complex, period: int) -> float:
+    w = z
+    previous_squared = 4.0
+    for _ in range(_NEWTON_STEPS):
+        g = w
+        dg = complex(1.0, 0.0)
+        for _ in range(period):
+            dg = 2.0*g*dg
+            g = g*g + c
+        step = (g - w) / (dg - 1.0)
+        w -= step
+        step_squared = step.real*step.real + step.imag*step.imag
+        if step_squared < 1e-24:
+            dg = complex(1.0, 0.0)
+            g = w
+            for _ in range(period):
+                dg = 2.0*g*dg
+                g = g*g + c
+            return dg.real*dg.real + dg.imag*dg.imag
+        if not step_squared < 0.25*previous_squared:
+            # near a cycle Newton's method converges quadratically, this isn't so give up before it costs more
+            return -1.0
+        previous_squared = step_squared
+    return -1.0
@@ -23,7 +23,8 @@ class CpuPixelTest:
         zipped = list(zip(self.c,
                           self.z,
                           self.iterations,
-                          itertools.repeat(self.end_iter)
+                          itertools.repeat(self.end_iter),
+                          self.z
                           ))
         self.timer.lap("zip to list")
 
@@ -42,8 +43,8 @@ class CpuPixelTest:
         # z_list, i_list = zip(*results)
         # self.z = np.array(z_list)
         # self.iterations = np.array(i_list)
-        self.z = np.array([z for z, i in results])
-        self.iterations = np.array([i for z, i in results])
+        self.z = np.array([z for z, i, z_saved, done in results])
+        self.iterations = np.array([i for z, i, z_saved, done in results])
         self.timer.lap("results")
         self.timer.stop()
         print(self.iterations)
@@ -3,7 +3,8 @@ extern "C" __global__
 void do_pixel(const complex<double>* c,
                   complex<double>* z,
                   int* iterations,
-                  const int end_iter
+                  const int end_iter,
+                  unsigned long long* work
                  )
 {
     int tid = blockDim.x * blockIdx.x + threadIdx.x;
@@ -16,6 +17,8 @@ void do_pixel(const complex<double>* c,
     double yy;
     double x2;
     bool cont = true;
+    // iterations done by this thread, added to work once at the end
+    int done = 0;
 
     x = z[tid].real();
     y = z[tid].imag();
@@ -23,7 +26,8 @@ void do_pixel(const complex<double>* c,
 
     xx = x * x;
     yy = y * y;
-    cont = (k < end_iter && xx + yy < 4.0);
+    // k == -1: already known to be trapped
+    cont = (k != -1 && k < end_iter && xx + yy < 4.0);
 
     while (cont)
     {
@@ -32,6 +36,7 @@ void do_pixel(const complex<double>* c,
         y = __fma_rn(x2, y, cy);
         x = xx - yy + cx;
         k++;
+        done++;
 
         if (k == end_iter)
         {
@@ -46,4 +51,8 @@ void do_pixel(const complex<double>* c,
     }
     z[tid] = complex<double>(x, y);
     iterations[tid] = k;
+    if (done > 0)
+    {
+        atomicAdd(work, (unsigned long long)done);
+    }
 }
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from typing import List, Union
+
+import numpy as np
+# import cupy as cp
+try:
+    import cupy as cp
+except ImportError:
+    cp = None
+except AttributeError:
+    cp = None
+
+if cp is None:
+    xp_ndarray = np.ndarray
+else:
+    xp_ndarray = Union[np.ndarray, cp.ndarray]
+
+# for interior_radius: tolerances relative to |z| where that is more than 1, and Newton steps tried
+_SEARCH_TOLERANCE = 1e-6
+_CYCLE_TOLERANCE = 1e-10
+_NEWTON_STEPS = 4
+
+# disks centred on the nucleus of the larger bulbs that lie wholly inside the bulb
+# radii are just inside the largest circle found to stay bounded for 300,000 iterations
+BULB_DISKS = [
+    (complex(-0.12256116687665364, 0.7448617666197442), 0.09),     # period 3
+    (complex(-0.12256116687665364, -0.7448617666197442), 0.09),    # period 3
+    (complex(-1.3107026413368328, 0.0), 0.055)                     # period 4
+]
+
+
+# vectorized test for pixels known to be in the set without iterating
+# the main cardioid and period 2 bulb are exact, the larger bulbs are optional
+def known_interior(c: xp_ndarray, bulbs: bool = True) -> xp_ndarray:
+    x = c.real
+    y = c.imag
+    yy = y * y
+
+    # main cardioid
+    x_quarter = x - 0.25
+    q = x_quarter * x_quarter + yy
+    inside = (q * (q + x_quarter) < 0.25 * yy)
+
+    # period 2 bulb: disk of radius 1/4 centred on -1
+    x_one = x + 1.0
+    inside |= (x_one * x_one + yy < 0.0625)
+
+    if bulbs:
+        for centre, radius in BULB_DISKS:
+            dx = x - centre.real
+            dy = y - centre.imag
+            inside |= (dx * dx + dy * dy < radius * radius)
+
+    return inside
+
+
+# radius of a disk about each c that is known to be inside the set, 0.0 where none was found
+# c has been found trapped with z on or near its attracting cycle
+# the cycle point and its period give the interior distance estimate b, and the disk of radius b/4 about c
+# is all inside the set (the Koebe 1/4 theorem applied to the multiplier map of c's hyperbolic component)
+def interior_radius(c: xp_ndarray, z: xp_ndarray, max_period: int = 1024) -> xp_ndarray:
+    xp = np if cp is None else cp.get_array_module(c)
+    radius = xp.zeros(shape=c.shape, dtype=xp.float64)
+
+    # first period that brings z back close to itself
+    period = xp.zeros(shape=c.shape, dtype=xp.int64)
+    index = xp.arange(c.size)
+    w = z
+    for p in range(1, max_period + 1):
+        w = w*w + c[index]
+        returned = _returned(xp, w, z[index], _SEARCH_TOLERANCE)
+        period[index[returned]] = p
+        keep = ~returned
+        index = index[keep]
+        w = w[keep]
+        if index.size == 0:
+            break
+
+    # in order of period, so the pixels still going at each step of a cycle are always those at the end
+    found = xp.flatnonzero(period > 0)
+    if found.size == 0:
+        return radius
+    found = found[xp.argsort(period[found], kind="stable")]
+    c = c[found]
+    period = period[found]
+
+    # the cycle point by Newton's method, it only has to move a little
+    w = z[found]
+    for _ in range(_NEWTON_STEPS):
+        g, dz, _, _, _ = _cycle_derivatives(xp, c, w, period)
+        w = w - (g - w) / (dz - 1.0)
+    # near a multiplier of -1 z can come back closer after two cycles than one
+    least = _least_period(xp, c, w, period)
+    if bool(xp.any(least != period)):
+        order = xp.argsort(least, kind="stable")
+        found, c, w, period = found[order], c[order], w[order], least[order]
+    g, dz, dc, dzdz, dcdz = _cycle_derivatives(xp, c, w, period)
+
+    # only where the cycle is there to rounding and attracts
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        estimate = (1.0 - xp.abs(dz)**2) / xp.abs(dcdz + dzdz*dc / (1.0 - dz))
+        certain = _returned(xp, g, w, _CYCLE_TOLERANCE) & (xp.abs(dz) < 1.0) & \
+            xp.isfinite(estimate) & (estimate > 0.0)
+    radius[found[certain]] = 0.25 * estimate[certain]
+    return radius
+
+
+def _returned(xp, w: xp_ndarray, z: xp_ndarray, tolerance: float) -> xp_ndarray:
+    return xp.abs(w - z) <= tolerance * xp.maximum(xp.abs(z), 1.0)
+
+
+# where the pixels still going after each step start, period is in order
+def _starts(xp, period: xp_ndarray) -> List[int]:
+    steps = xp.arange(int(period[-1]))
+    return xp.searchsorted(period, steps, side="right").tolist()
+
+
+# the smallest divisor of each period that w is periodic with, period is in order
+def _least_period(xp, c: xp_ndarray, w: xp_ndarray, period: xp_ndarray) -> xp_ndarray:
+    least = xp.copy(period)
+    settled = xp.zeros(shape=period.shape, dtype=xp.bool_)
+    g = xp.copy(w)
+    for p, start in enumerate(_starts(xp, period)[1:], start=1):
+        going = slice(start, None)
+        g[going] = g[going]*g[going] + c[going]
+        periodic = ~settled[going] & (period[going] % p == 0) & _returned(xp, g[going], w[going], _CYCLE_TOLERANCE)
+        least[going][periodic] = p
+        settled[going] |= periodic
+    return least
+
+
+# f^period(w) with its first derivatives and the second derivatives in z, each to its own period
+# period is in order
+def _cycle_derivatives(xp, c: xp_ndarray, w: xp_ndarray, period: xp_ndarray):
+    g = xp.copy(w)
+    dz = xp.ones_like(w)
+    dc = xp.zeros_like(w)
+    dzdz = xp.zeros_like(w)
+    dcdz = xp.zeros_like(w)
+    for start in _starts(xp, period):
+        going = slice(start, None)
+        gg = g[going]
+        dz_going = dz[going]
+        dc_going = dc[going]
+        # second derivatives first, they use the first derivatives before the step
+        dzdz[going] = 2.0*(dz_going*dz_going + gg*dzdz[going])
+        dcdz[going] = 2.0*(dz_going*dc_going + gg*dcdz[going])
+        dz[going] = 2.0*gg*dz_going
+        dc[going] = 2.0*gg*dc_going + 1.0
+        g[going] = gg*gg + c[going]
+    return g, dz, dc, dzdz, dcdz
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import math
+from typing import Optional
+
+
+# chooses iterations_per_kernel for each loop of ComputeManager.compute_flat_array
+# short kernels while lots of pixels are escaping so they are compacted out sooner
+# long kernels once the continuing set is stable so the per-kernel overhead is spread over more iterations
+# never longer than target_seconds at the measured speed, so stop requests are still seen promptly
+class KernelSizer:
+    def __init__(self,
+                 initial_iterations: int = 1000,
+                 min_iterations: int = 100,
+                 max_iterations: int = 100000,
+                 target_seconds: float = 0.25,
+                 escaping_fraction: float = 0.01):
+        self.initial_iterations: int = initial_iterations
+        self.min_iterations: int = min_iterations
+        self.max_iterations: int = max_iterations
+        self.target_seconds: float = target_seconds
+        # more than this fraction of the continuing pixels escaping in a loop counts as still escaping
+        self.escaping_fraction: float = escaping_fraction
+
+        self.iterations_per_kernel: int = initial_iterations
+        # measured speed, kept between requests and jobs as it depends mostly on the machine
+        self._pixel_iterations_per_second: Optional[float] = None
+
+    def start_request(self, pixel_count: int) -> int:
+        self.iterations_per_kernel = self._limit(self.initial_iterations, pixel_count)
+        return self.iterations_per_kernel
+
+    # after each loop: what was run, how long the kernels took and what happened to the pixels
+    def record_loop(self,
+                    pixel_count: int,
+                    iterations: int,
+                    seconds: float,
+                    count_escaped: int,
+                    count_still_continuing: int) -> int:
+        if seconds > 0.0 and pixel_count > 0 and iterations > 0:
+            # pixels that escape part way through make this an over-estimate of the cost, so on the safe side
+            self._pixel_iterations_per_second = float(pixel_count) * float(iterations) / seconds
+
+        if pixel_count > 0 and count_escaped > self.escaping_fraction * pixel_count:
+            iterations_per_kernel = self.iterations_per_kernel // 2
+        else:
+            iterations_per_kernel = self.iterations_per_kernel * 2
+
+        self.iterations_per_kernel = self._limit(iterations_per_kernel, count_still_continuing)
+        return self.iterations_per_kernel
+
+    def _limit(self, iterations_per_kernel: int, pixel_count: int) -> int:
+        if self._pixel_iterations_per_second is not None and pixel_count > 0:
+            time_limit = self._pixel_iterations_per_second * self.target_seconds / float(pixel_count)
+            iterations_per_kernel = min(iterations_per_kernel, math.floor(time_limit))
+        iterations_per_kernel = min(max(iterations_per_kernel, self.min_iterations), self.max_iterations)
+        # keep to round numbers of iterations
+        return (iterations_per_kernel // self.min_iterations) * self.min_iterations
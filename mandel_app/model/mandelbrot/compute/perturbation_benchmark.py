@@ -0,0 +1,103 @@
+from fractions import Fraction
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import utils
+from mandel_app import tuples
+from mandel_app.model.mandelbrot import mandel
+from mandel_app.model.mandelbrot.compute import compute_manager, reference_orbit
+
+
+# times ComputeManager on deep zooms iterating by perturbation, and by double-double where that can still tell
+# the pixels apart, each forced so they can be compared at the same depth
+# a sample of pixels is checked against iterating them directly at high precision with ReferenceOrbit
+# run from the project directory: python -m mandel_app.model.mandelbrot.compute.perturbation_benchmark
+class PerturbationBenchmark:
+    def __init__(self,
+                 shape: tuples.ImageShape = tuples.ImageShape(x=400, y=250),
+                 max_iterations: int = 20000,
+                 sample_size: int = 100):
+        self.shape: tuples.ImageShape = shape
+        self.max_iterations: int = max_iterations
+        self.sample_size: int = sample_size
+        self.timer = utils.Timer()
+        self.views: Dict[str, mandel.Mandel] = self._deep_views()
+        # double-double has about 106 bits, too few for the deepest view
+        self.precisions: Dict[str, List[str]] = {
+            "1e-20": ["perturbation", "double_double"],
+            "1e-50": ["perturbation"]
+        }
+
+    def _deep_views(self) -> Dict[str, mandel.Mandel]:
+        # c = i is a Misiurewicz point, on the boundary with detail at every depth
+        # and exact as a float64 so it can be the centre of any zoom
+        return {
+            "1e-20": mandel.Mandel(centre=complex(0.0, 1.0), size=1e-20, shape=self.shape),
+            "1e-50": mandel.Mandel(centre=complex(0.0, 1.0), size=1e-50, shape=self.shape)
+        }
+
+    @staticmethod
+    def generate_c(mandel_: mandel.Mandel) -> Tuple[np.ndarray, np.ndarray]:
+        # as Server._generate_c, with the offsets from the centre that perturbation uses
+        m = mandel_
+        y, x = np.ogrid[-m.y_size/2.0: m.y_size/2.0: m.shape.y * 1j,
+                        -m.x_size/2.0: m.x_size/2.0: m.shape.x * 1j]
+        c = m.centre + x*m.x_unit + y*m.y_unit
+        dc = x*m.x_unit + y*m.y_unit
+        return c.flatten(), dc.flatten()
+
+    def run(self):
+        manager = compute_manager.ComputeManager(self.max_iterations)
+        for view_name, mandel_ in self.views.items():
+            c, dc = self.generate_c(mandel_)
+            print(f"\n{view_name}: {c.size} pixels, max {self.max_iterations} iterations")
+
+            for precision in self.precisions[view_name]:
+                manager.forced_precision = precision
+                manager.reset_statistics()
+                manager.set_view(mandel_)
+
+                self.timer.start()
+                iteration = self._result(manager, c, dc)
+                time = self.timer.stop(show=False)
+                mega_pixels_per_second = (c.size / time) / 10**6
+                print(f"{manager.statistics.precision}\t{time:.3f}s\t{mega_pixels_per_second:.4f} mega-pixels/s")
+                print(f"{manager.statistics}")
+
+                mismatches = self._check(mandel_, dc, iteration, manager.final_iteration)
+                print(f"{mismatches} of {self.sample_size} sampled pixels differ from high precision")
+
+            # plain float64 can't tell the pixels apart at this depth
+            print(f"distinct c values in float64: {np.unique(c).size}")
+        manager.shutdown()
+
+    # a for loop would throw away the return value
+    @staticmethod
+    def _result(manager: compute_manager.ComputeManager, c: np.ndarray, dc: np.ndarray) -> np.ndarray:
+        generator = manager.compute_flat_array(c, dc=dc)
+        while True:
+            try:
+                next(generator)
+            except StopIteration as stop:
+                return stop.value
+
+    def _check(self, mandel_: mandel.Mandel, dc: np.ndarray, iteration: np.ndarray, final_iteration: int) -> int:
+        mismatches = 0
+        indices = np.linspace(0, dc.size - 1, num=min(self.sample_size, dc.size)).astype(np.int64)
+        for index in indices:
+            pixel_dc = complex(dc[index])
+            orbit = reference_orbit.ReferenceOrbit(mandel_.precise_centre.real + Fraction(pixel_dc.real),
+                                                   mandel_.precise_centre.imag + Fraction(pixel_dc.imag),
+                                                   precision_bits=64 + int(-np.log2(mandel_.size_per_gap)))
+            escaped_at = orbit.escape_iteration(final_iteration)
+            # early stopping reports everything still going as max_iterations
+            expected = self.max_iterations if escaped_at is None else escaped_at
+            if iteration[index] != expected:
+                mismatches += 1
+        return mismatches
+
+
+if __name__ == "__main__":
+    perturbation_benchmark = PerturbationBenchmark()
+    perturbation_benchmark.run()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import math
+from fractions import Fraction
+from typing import Optional, Union
+
+import numpy as np
+
+# anything Fraction takes exactly: int, float, Fraction, Decimal or a decimal string
+Exact = Union[int, float, Fraction, str]
+
+
+# the orbit of one point iterated at high precision, for ComputePerturbation to iterate pixel deltas against
+# fixed point python ints with precision_bits after the point, so no extra packages are needed
+# values are rounded to complex128 as they are found, they are only ever added to small deltas
+# also keeps the series approximation coefficients for deltas about this orbit:
+#   delta_n = a_n*dc + b_n*dc^2 + c_n*dc^3
+class ReferenceOrbit:
+    # how many values are added at a time when more are asked for
+    chunk: int = 1024
+
+    def __init__(self, real: Exact, imag: Exact, precision_bits: int):
+        self.precision_bits: int = precision_bits
+        self.real: Fraction = Fraction(real)
+        self.imag: Fraction = Fraction(imag)
+        self._scale: int = 1 << precision_bits
+        self._four: int = 4 << precision_bits
+        self._cx: int = math.floor(self.real * self._scale)
+        self._cy: int = math.floor(self.imag * self._scale)
+
+        # as everywhere else the orbit starts at z = c with iteration 0
+        self._x: int = self._cx
+        self._y: int = self._cy
+        # iteration at which the orbit escaped, None if it hasn't (yet)
+        self.escaped_at: Optional[int] = None
+
+        self._count: int = 0
+        self._values: np.ndarray = np.empty(shape=(0,), dtype=np.complex128)
+        self._a: np.ndarray = np.empty(shape=(0,), dtype=np.complex128)
+        self._b: np.ndarray = np.empty(shape=(0,), dtype=np.complex128)
+        self._c: np.ndarray = np.empty(shape=(0,), dtype=np.complex128)
+        # delta_0 = dc since z_0 = c
+        self._next_a: complex = complex(1.0, 0.0)
+        self._next_b: complex = complex(0.0, 0.0)
+        self._next_c: complex = complex(0.0, 0.0)
+        self._append_value()
+
+    # values found so far, values[n] is the orbit after n iterations
+    @property
+    def values(self) -> np.ndarray:
+        return self._values[:self._count]
+
+    @property
+    def a(self) -> np.ndarray:
+        return self._a[:self._count]
+
+    @property
+    def b(self) -> np.ndarray:
+        return self._b[:self._count]
+
+    @property
+    def c(self) -> np.ndarray:
+        return self._c[:self._count]
+
+    @property
+    def complete(self) -> bool:
+        return self.escaped_at is not None
+
+    # make values available up to and including iteration n, or to where the orbit escaped if sooner
+    def extend_to(self, n: int):
+        p = self.precision_bits
+        while self._count <= n and self.escaped_at is None:
+            x = self._x
+            y = self._y
+            xx = x * x
+            yy = y * y
+            if xx + yy >= self._four << p:
+                self.escaped_at = self._count - 1
+                break
+            self._y = ((x * y) >> (p - 1)) + self._cy
+            self._x = ((xx - yy) >> p) + self._cx
+            self._append_value()
+
+    def _append_value(self):
+        if self._count == self._values.size:
+            size = self._values.size + self.chunk
+            self._values = np.resize(self._values, size)
+            self._a = np.resize(self._a, size)
+            self._b = np.resize(self._b, size)
+            self._c = np.resize(self._c, size)
+
+        # true division of python ints is correctly rounded however many bits they have
+        z = complex(self._x / self._scale, self._y / self._scale)
+        n = self._count
+        self._values[n] = z
+        self._a[n] = self._next_a
+        self._b[n] = self._next_b
+        self._c[n] = self._next_c
+        self._count += 1
+
+        # delta_n+1 = 2*z_n*delta_n + delta_n^2 + dc, matched term by term
+        a = self._next_a
+        b = self._next_b
+        self._next_a = 2.0*z*a + 1.0
+        self._next_b = 2.0*z*b + a*a
+        self._next_c = 2.0*z*self._next_c + 2.0*a*b
+
+    # iterations a point takes to escape, or None if it hasn't by max_iterations
+    # slow, for checking a few pixels of a deep zoom
+    def escape_iteration(self, max_iterations: int) -> Optional[int]:
+        self.extend_to(max_iterations)
+        return self.escaped_at
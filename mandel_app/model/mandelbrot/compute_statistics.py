@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List
+
+
+# counts collected by ComputeManager while a job runs, copied onto the finished Mandel
+@dataclass
+class ComputeStatistics:
+    # pixels found to be inside the main cardioid or a known bulb without iterating
+    prefiltered_pixels: int = 0
+    # working buffers allocated by ComputeManager and the most memory they held at once
+    buffer_allocations: int = 0
+    peak_buffer_bytes: int = 0
+    # times a compute backend failed and the request was restarted on the next one
+    backend_fallbacks: int = 0
+    # backend the results came from, and the configured one if it can't run on this machine
+    backend: str = ""
+    unavailable_backend: str = ""
+    # fraction of the time each worker process was busy while its backend had work for them, empty without workers
+    # all close to 1.0 means none were left idle at the tail of a kernel
+    worker_utilisation: List[float] = field(default_factory=list)
+    # pixels stopped early as still going, when their tile or the whole request went quiet
+    # or the request reached its early_stopping_iteration
+    # and the iterations up to max_iterations they were spared
+    early_stopped_pixels: int = 0
+    early_stopped_iterations: int = 0
+    # pixels left at max_iterations still going when the job was finished early, see ComputeManager.start_budget
+    unfinished_pixels: int = 0
+    # pixels iterated without the near return check though near_return_tolerance is set
+    # as the engine doesn't track the derivative (Backend.tracks_derivative)
+    near_return_skipped_pixels: int = 0
+    # pixels carried on from the z and iteration they had reached in the previous result, see Mandel.capped_index
+    resumed_pixels: int = 0
+    # pixels inside the interior disk of a computed pixel, filled by Server without computing
+    interior_disk_pixels: int = 0
+    # Mesh boxes proven by affine arithmetic to be the value of their perimeter, and those that couldn't be
+    certified_cells: int = 0
+    rejected_cells: int = 0
+    # float64, float32 for shallow zooms with mixed_precision, or for deeper zooms double_double or perturbation
+    precision: str = "float64"
+    # float32: pixels whose float32 result was in doubt so were iterated again in float64
+    single_recomputed_pixels: int = 0
+    # deep zooms: reference orbits iterated at high precision, including new ones for glitched pixels
+    perturbation_references: int = 0
+    # most iterations skipped by series approximation in a request
+    series_skipped_iterations: int = 0
+    # pixels iterated again against a new reference, and any still glitched after ComputeManager.max_references
+    glitched_pixels: int = 0
+    unresolved_glitches: int = 0
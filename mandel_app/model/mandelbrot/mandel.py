@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import copy
 import math
 from dataclasses import dataclass
 from typing import Optional
@@ -7,6 +8,7 @@ from typing import Optional
 import numpy as np
 
 from mandel_app import tuples
+from mandel_app.model.mandelbrot import compute_statistics, precise_complex
 
 
 @dataclass
@@ -19,6 +21,9 @@ class Mandel:
     theta_degrees: int = 0
     expected_iterations_per_pixel: float = 0.0
     has_border: bool = False
+    # the exact centre, centre is this rounded to float64
+    # from centre if not given, zoom and pan keep it exact however deep they go
+    precise_centre: Optional[precise_complex.PreciseComplex] = None
 
     def __post_init__(self):
         # self.original_shape: tuples.ImageShape = self.shape
@@ -31,6 +36,16 @@ class Mandel:
         self.iterations_performed: int = 0
         self.iterations_per_pixel: float = 0.0
         self.final_iteration: int = 0
+        self.compute_statistics: compute_statistics.ComputeStatistics = compute_statistics.ComputeStatistics()
+        # pixels left at max_iteration without being found to stay in the set, so Server can resume them
+        # if max_iterations is raised: flat positions in iteration, z and the iteration each reached
+        # (z = c and 0 where never iterated, such as box fills), None if not kept for every pixel
+        self.capped_index: Optional[np.ndarray] = None
+        self.capped_z: Optional[np.ndarray] = None
+        self.capped_iteration: Optional[np.ndarray] = None
+        # finished early by its time budget or a stop, so pixels at max_iteration may only not have got there yet
+        # they are capped, and resumed when it is computed again
+        self.provisional: bool = False
 
         # keep track of the contents of iteration at all times
         # self.iteration_shape: tuples.ImageShape = self.shape
@@ -44,6 +59,11 @@ class Mandel:
             else:
                 self.size_per_gap = self.size / float(self.shape.x-1)
 
+        if self.precise_centre is None:
+            self.precise_centre = precise_complex.PreciseComplex.from_complex(self.centre)
+        else:
+            self.set_centre(self.precise_centre)
+
     @property
     def x_size(self) -> float:
         return self.size_per_gap * float(self.shape.x-1)
@@ -67,6 +87,7 @@ class Mandel:
 
     def lite_copy(self,
                   centre: Optional[complex] = None,
+                  precise_centre: Optional[precise_complex.PreciseComplex] = None,
                   shape: Optional[tuples.ImageShape] = None,
                   size: Optional[float] = None,
                   size_per_gap: Optional[float] = None,
@@ -74,6 +95,9 @@ class Mandel:
                   expected_iterations_per_pixel: Optional[float] = None,
                   has_border: Optional[bool] = None
                   ) -> Mandel:
+        if centre is None and precise_centre is None:
+            precise_centre = self.precise_centre
+        # replaced by precise_centre rounded if that is given
         centre = self._if_none(centre, self.centre)
         shape = self._if_none(shape, self.shape)
         size = self._if_none(size, self.size)
@@ -89,7 +113,8 @@ class Mandel:
             size_per_gap=size_per_gap,
             theta_degrees=theta_degrees,
             expected_iterations_per_pixel=expected_iterations_per_pixel,
-            has_border=has_border
+            has_border=has_border,
+            precise_centre=precise_centre
         )
 
     # region Methods
@@ -99,6 +124,36 @@ class Mandel:
             return val
         return var
 
+    def set_centre(self, precise_centre: precise_complex.PreciseComplex):
+        self.precise_centre = precise_centre.rounded(self.size_per_gap)
+        self.centre = self.precise_centre.to_complex()
+
+    # the same view for a max_iteration no higher, without computing: counts below it are kept, the rest become it
+    # counts clamped are capped to start again from z = c, so they are iterated again if max_iteration is raised
+    def clamped_copy(self, max_iteration: int) -> Mandel:
+        clamped = self.lite_copy()
+        clamped.iteration = np.minimum(self.iteration, max_iteration)
+        clamped.max_iteration = max_iteration
+        clamped.final_iteration = min(self.final_iteration, max_iteration)
+        clamped.provisional = self.provisional
+        # as they were computed, Model._is_derivable needs to know if any pixels were early stopped
+        clamped.compute_statistics = copy.copy(self.compute_statistics)
+        clamped.time_taken = self.time_taken
+        clamped.iterations_performed = self.iterations_performed
+        clamped.iterations_per_pixel = self.iterations_per_pixel
+        if self.capped_index is not None:
+            flat_iteration = self.iteration.reshape(-1)
+            capped = np.zeros(shape=flat_iteration.shape, dtype=np.bool_)
+            capped[self.capped_index] = True
+            escaped = flat_iteration < self.max_iteration
+            newly_capped = np.flatnonzero(escaped & (flat_iteration >= max_iteration) & ~capped)
+            # iteration 0 is from z = c whatever z is
+            clamped.capped_index = np.concatenate((self.capped_index, newly_capped))
+            clamped.capped_z = np.concatenate((self.capped_z, np.zeros(shape=newly_capped.shape, dtype=np.complex128)))
+            clamped.capped_iteration = np.concatenate((self.capped_iteration,
+                                                       np.zeros(shape=newly_capped.shape, dtype=np.int32)))
+        return clamped
+
     # def pan_centre(self, pan: tuples.PixelPoint):
     #     new_centre_pixel = tuples.PixelPoint(
     #         x=float(self.shape.x)/2.0 + pan.x,
@@ -163,6 +218,23 @@ class Mandel:
         #
         # return self.centre + x_dist*self.x_unit + y_dist*self.y_unit
 
+    # as get_complex_from_frame_point and get_complex_from_center_diff but exact, for moving the view
+    def get_precise_from_frame_point(self,
+                                     frame_shape: tuples.ImageShape,
+                                     frame_point: tuples.PixelPoint
+                                     ) -> precise_complex.PreciseComplex:
+        center_diff = tuples.PixelPoint(
+            x=frame_point.x - 0.5*(frame_shape.x-1),
+            y=frame_point.y - 0.5*(frame_shape.y-1)
+        )
+        return self.get_precise_from_center_diff(center_diff)
+
+    def get_precise_from_center_diff(self, center_diff: tuples.PixelPoint) -> precise_complex.PreciseComplex:
+        x_dist = center_diff.x * self.size_per_gap
+        y_dist = center_diff.y * self.size_per_gap
+        # only the offset is float64, a few pixels at most so nothing is lost
+        return self.precise_centre + (x_dist*self.x_unit + y_dist*self.y_unit)
+
     def get_complex_from_center_diff(self,
                                      # frame_shape: tuples.ImageShape,
                                      center_diff: tuples.PixelPoint
@@ -26,6 +26,9 @@ class MandelJob(thread.Job):
         if display_progress:
             self.progress_estimator = mandel_progress_estimator.MandelProgressEstimator()
         self.save_history: bool = save_history
+        # only a job being waited on finishes early, a background job is just stopped
+        self.finishes_on_stop = display_progress and compute_manager.finish_on_stop
+        self._time_budget: float = compute_manager.time_budget if display_progress else 0.0
 
     def set_previous_mandel(self,
                             prev_mandel: mandel.Mandel,
@@ -38,9 +41,19 @@ class MandelJob(thread.Job):
     def new_mandel(self) -> mandel.Mandel:
         return self._new_mandel
 
+    def request_finish(self):
+        super().request_finish()
+        self._compute_manager.request_finish()
+
     # calculates a mandel using whatever algorithm is implemented
     def _exec(self) -> Generator[float, None, None]:
         pixel_count: int = 0    # just to make warning go away
+        self._compute_manager.reset_statistics()
+        self._compute_manager.start_budget(self._time_budget)
+        if self.finish_requested:
+            self._compute_manager.request_finish()
+        self._compute_manager.stop_token = self.stop_token
+        self._compute_manager.set_view(self._new_mandel)
 
         # set up arrays and do any copy-over from previous results that's possible
         yield 0.0
@@ -85,9 +98,19 @@ class MandelJob(thread.Job):
         # algorithm_ = algorithm.BoxAlgorithm(compute_server_, m.shape)
         # self._mandel.iteration = algorithm_.run()
 
-        algorithm_ = algorithm.Mesh(server_, self.progress_estimator)
+        algorithm_ = algorithm.Mesh(server_,
+                                    self.progress_estimator,
+                                    base_size=self._compute_manager.mesh_base_size,
+                                    certify=self._compute_manager.certify_box_fills,
+                                    max_iterations=self._compute_manager.max_iterations)
 
-        self._new_mandel.iteration = yield from algorithm_.run()
+        try:
+            self._new_mandel.iteration = yield from algorithm_.run()
+        except compute.Stopped:
+            # the job is being thrown away
+            return
+        self._compute_manager.statistics.certified_cells += algorithm_.certified_cells
+        self._compute_manager.statistics.rejected_cells += algorithm_.rejected_cells
 
         # self._new_mandel.iteration_shape = self._new_mandel.shape
         # self._new_mandel.iteration_offset = self._new_mandel.offset
@@ -107,3 +130,8 @@ class MandelJob(thread.Job):
         # print("self._compute_manager.final_iteration=", self._compute_manager.final_iteration)
         if not self._new_mandel.has_border:
             self._new_mandel.final_iteration = self._compute_manager.final_iteration
+        capped_state = server_.capped_state
+        if capped_state is not None:
+            self._new_mandel.capped_index, self._new_mandel.capped_z, self._new_mandel.capped_iteration = capped_state
+        self._new_mandel.compute_statistics = copy.copy(self._compute_manager.statistics)
+        self._new_mandel.provisional = self._compute_manager.statistics.unfinished_pixels > 0 or server_.provisional
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from decimal import Decimal
+from fractions import Fraction
+from typing import NamedTuple
+
+
+class DecimalComplex(NamedTuple):
+    real: Decimal
+    imag: Decimal
+
+
+# a point held exactly, for view coordinates that float64 can't hold at depth
+# zooming and panning only ever add float64 offsets, so the parts stay binary fractions (fixed point of any length)
+@dataclass(frozen=True)
+class PreciseComplex:
+    real: Fraction
+    imag: Fraction
+
+    @staticmethod
+    def from_complex(z: complex) -> PreciseComplex:
+        # exact, every float64 is a binary fraction
+        return PreciseComplex(Fraction(z.real), Fraction(z.imag))
+
+    # nearest float64
+    def to_complex(self) -> complex:
+        return complex(float(self.real), float(self.imag))
+
+    # add a float64 offset exactly
+    def __add__(self, offset: complex) -> PreciseComplex:
+        return PreciseComplex(self.real + Fraction(offset.real), self.imag + Fraction(offset.imag))
+
+    # to a multiple of 2^-64 of step, so bits far below anything that can be seen don't build up
+    def rounded(self, step: float) -> PreciseComplex:
+        quantum = Fraction(2) ** (math.floor(math.log2(step)) - 64)
+        return PreciseComplex(round(self.real / quantum) * quantum, round(self.imag / quantum) * quantum)
+
+    # exact decimals rounded to places, for display
+    def to_decimal(self, places: int) -> DecimalComplex:
+        scale = 10 ** places
+        return DecimalComplex(Decimal(f"{round(self.real * scale)}E-{places}"),
+                              Decimal(f"{round(self.imag * scale)}E-{places}"))
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, Callable, List, Generator, Union
+from typing import Optional, Callable, List, Generator, Tuple, Union
 
 import numpy as np
 # import cupy as cp
@@ -21,6 +21,10 @@ if cp is None:
 else:
     xp_ndarray = Union[np.ndarray, cp.ndarray]
 
+# interior disks are filled out to at most this many pixels from their centre
+# the fill costs in proportion, and disks this big are nearly always covered by their neighbours anyway
+_DISK_REACH = 32
+
 
 # generate one for each mandel calculation
 # serves requests for mandel pixel calculations
@@ -48,20 +52,15 @@ class Server:
 
         shape = (self._new_mandel.shape.y, self._new_mandel.shape.x)
 
-        self._iteration: xp_ndarray
-        self._completed: xp_ndarray
-        self._requested: xp_ndarray
-        self._c: xp_ndarray
-        if self._compute_manager.has_cuda:
-            self._iteration = cp.zeros(shape=shape, dtype=cp.int32)
-            self._completed = cp.zeros(shape=shape, dtype=cp.bool)
-            self._requested = cp.zeros(shape=shape, dtype=cp.bool)
-            self._c = cp.zeros(shape=shape, dtype=cp.float64)
-        else:
-            self._iteration = np.zeros(shape=shape, dtype=np.int32)
-            self._completed = np.zeros(shape=shape, dtype=np.bool)
-            self._requested = np.zeros(shape=shape, dtype=np.bool)
-            self._c = np.zeros(shape=shape, dtype=np.float64)
+        # array module of the compute backend, fixed for the life of the server even if the backend falls back
+        self._xp = self._compute_manager.xp
+        xp = self._xp
+        self._iteration: xp_ndarray = xp.zeros(shape=shape, dtype=xp.int32)
+        self._completed: xp_ndarray = xp.zeros(shape=shape, dtype=xp.bool_)
+        self._requested: xp_ndarray = xp.zeros(shape=shape, dtype=xp.bool_)
+        self._c: xp_ndarray = xp.zeros(shape=shape, dtype=xp.float64)
+        # offsets of c from the centre, only for deep zooms where adding the centre rounds them away
+        self._dc: Optional[xp_ndarray] = None
 
         self._requests: List[request.Request] = []
 
@@ -69,10 +68,22 @@ class Server:
         self._box_iter_cpu: np.ndarray = np.zeros(shape=shape, dtype=np.int32)
         self._box_fill_cpu: np.ndarray = np.zeros(shape=shape, dtype=np.bool)
 
+        # pixels at max_iterations not found to stay in the set, with the z and the iteration they reached
+        # see Mandel.capped_index, those not completed are resumed from there when computed
+        self._capped: xp_ndarray = xp.zeros(shape=shape, dtype=xp.bool_)
+        self._capped_z: xp_ndarray = xp.zeros(shape=shape, dtype=xp.complex128)
+        self._capped_iteration: xp_ndarray = xp.zeros(shape=shape, dtype=xp.int32)
+        # False once any pixel has been left at max_iterations without its state, so none can be resumed later
+        self._keeps_capped: bool = True
+        # pixels were copied over from a provisional result without being resumed, so the result is provisional too
+        self.provisional: bool = False
+
         self._build()
 
     def _build(self):
         self._c = self._generate_c()
+        # deep zooms don't iterate c itself, so have no z to resume from
+        self._keeps_capped = self._dc is None
 
         if self._prev_mandel is not None and self._offset is not None:
             self._copy_over_prev()
@@ -89,10 +100,9 @@ class Server:
         y, x = np.ogrid[-m.y_size/2.0: m.y_size/2.0: m.shape.y * 1j,
                         -m.x_size/2.0: m.x_size/2.0: m.shape.x * 1j]
         c = m.centre + x*m.x_unit + y*m.y_unit
-        if self._compute_manager.has_cuda:
-            return cp.asarray(c)
-        else:
-            return c
+        if self._compute_manager.uses_offsets:
+            self._dc = self._xp.asarray(x*m.x_unit + y*m.y_unit)
+        return self._xp.asarray(c)
 
     def _copy_over_prev(self):
         new = self._new_mandel.shape
@@ -159,52 +169,97 @@ class Server:
             # print(f"new_slice_x : {new_slice_x}")
             # print(f"new_slice_y : {new_slice_y}")
 
-            if self._compute_manager.has_cuda:
-                prev_iteration = cp.asarray(self._prev_mandel.iteration)
-            else:
-                prev_iteration = self._prev_mandel.iteration
+            prev_iteration = self._xp.asarray(self._prev_mandel.iteration)
 
             self._iteration[new_slice_y, new_slice_x] = prev_iteration[prev_slice_y, prev_slice_x]
             self._completed[new_slice_y, new_slice_x] = True
+            self._copy_over_capped((prev_slice_y, prev_slice_x), (new_slice_y, new_slice_x))
+
+    # the capped pixels copied over keep their state, and if max_iterations has changed since
+    # pixels left at the old max_iterations that weren't capped stay in the set whatever it is now
+    # counts past a lowered max_iterations are capped at it, to start again from z = c if it is raised later
+    # capped pixels short of max_iterations are resumed if it has been raised or early stopping is off
+    # or if the previous result was provisional, unless keeping to an early_stopping_iteration as a border does
+    # without capped state, pixels at max_iterations are computed again if any of them may have been early stopped
+    def _copy_over_capped(self, prev_slices: Tuple[slice, slice], new_slices: Tuple[slice, slice]):
+        xp = self._xp
+        prev = self._prev_mandel
+        max_iterations = self._compute_manager.max_iterations
+        iteration = self._iteration[new_slices]
+        refine = prev.provisional and self._early_stopping_iteration is None
+        self.provisional = prev.provisional and not refine
+        if prev.capped_index is None:
+            self._keeps_capped = False
+            early_stopped = not self._compute_manager.early_stopping and \
+                prev.compute_statistics.early_stopped_pixels > 0
+            if prev.max_iteration != max_iterations or refine or early_stopped:
+                # only escape counts under both can be told apart from where the old max_iterations stopped
+                self._completed[new_slices] = iteration < min(prev.max_iteration, max_iterations)
+            return
+
+        prev_size = prev.shape.x * prev.shape.y
+        prev_shape = (prev.shape.y, prev.shape.x)
+        prev_capped = xp.zeros(shape=(prev_size,), dtype=xp.bool_)
+        prev_capped_z = xp.zeros(shape=(prev_size,), dtype=xp.complex128)
+        prev_capped_iteration = xp.zeros(shape=(prev_size,), dtype=xp.int32)
+        prev_index = xp.asarray(prev.capped_index)
+        prev_capped[prev_index] = True
+        prev_capped_z[prev_index] = xp.asarray(prev.capped_z)
+        prev_capped_iteration[prev_index] = xp.asarray(prev.capped_iteration)
+        # slices are views so these update the server's arrays in place
+        capped = self._capped[new_slices]
+        capped_z = self._capped_z[new_slices]
+        capped_iteration = self._capped_iteration[new_slices]
+        capped[...] = prev_capped.reshape(prev_shape)[prev_slices]
+        capped_z[...] = prev_capped_z.reshape(prev_shape)[prev_slices]
+        capped_iteration[...] = prev_capped_iteration.reshape(prev_shape)[prev_slices]
+
+        in_set = (iteration >= prev.max_iteration) & ~capped
+        iteration[in_set] = max_iterations
+        over = (iteration >= max_iterations) & ~in_set & ~capped
+        capped[over] = True
+        capped_z[over] = self._c[new_slices][over]
+        capped_iteration[over] = 0
+        iteration[capped] = max_iterations
+
+        if max_iterations > prev.max_iteration or not self._compute_manager.early_stopping or refine:
+            resuming = capped & (capped_iteration < max_iterations)
+            self._completed[new_slices] = ~resuming
     # endregion
 
     @property
     def shape(self) -> tuples.ImageShape:
         return self._new_mandel.shape
 
+    @property
+    def xp(self):
+        return self._xp
+
     @property
     def complete(self) -> bool:
         return self._completed.all()
 
     @property
     def incomplete_count(self) -> int:
-        if self._compute_manager.has_cuda:
-            xp = cp.get_array_module(self._requested)
-        else:
-            xp = np
-        return int(xp.count_nonzero(~self._completed))
+        return int(self._xp.count_nonzero(~self._completed))
 
     @property
     def new_request_count(self) -> int:
-        if self._compute_manager.has_cuda:
-            xp = cp.get_array_module(self._requested)
-        else:
-            xp = np
-        return int(xp.count_nonzero(self._requested & ~self._completed))
+        return int(self._xp.count_nonzero(self._requested & ~self._completed))
 
     @property
     def iteration_cpu(self) -> np.ndarray:
-        if self._compute_manager.has_cuda:
-            return cp.asnumpy(self._iteration)
-        else:
-            return self._iteration
+        return self._to_cpu(self._iteration)
 
     @property
     def c_cpu(self) -> np.ndarray:
-        if self._compute_manager.has_cuda:
-            return cp.asnumpy(self._c)
+        return self._to_cpu(self._c)
+
+    def _to_cpu(self, array: xp_ndarray) -> np.ndarray:
+        if self._xp is np:
+            return array
         else:
-            return self._iteration
+            return cp.asnumpy(array)
 
     # TODO: implement for flatten
     def compute_flat_array(self, gpu_c_flat: cp.ndarray) -> cp.ndarray:
@@ -255,33 +310,38 @@ class Server:
         self._reset()
 
     def _do_box_fills(self):
-        if self._compute_manager.has_cuda:
-            box_fill_gpu = cp.asarray(self._box_fill_cpu)
-            box_iter_gpu = cp.asarray(self._box_iter_cpu)
-
-            self._completed[box_fill_gpu] = True
-            self._iteration[box_fill_gpu] = box_iter_gpu[box_fill_gpu]
-        else:
-            self._completed[self._box_fill_cpu] = True
-            self._iteration[self._box_fill_cpu] = self._box_iter_cpu[self._box_fill_cpu]
+        box_fill = self._xp.asarray(self._box_fill_cpu)
+        box_iter = self._xp.asarray(self._box_iter_cpu)
+        self._completed[box_fill] = True
+        self._iteration[box_fill] = box_iter[box_fill]
+        # boxes filled at max_iterations are only a guess that they stay in the set
+        filled_capped = box_fill & (box_iter >= self._compute_manager.max_iterations)
+        self._capped[box_fill] = False
+        self._capped[filled_capped] = True
+        self._capped_z[filled_capped] = self._c[filled_capped]
+        self._capped_iteration[filled_capped] = 0
 
     def _compute_new_requests(self) -> Generator[float, None, None]:
         # find new requests (2D)
         new_requests = self._requested & ~self._completed  # ~ is logical_not
-        if self._compute_manager.has_cuda:
-            xp = cp.get_array_module(new_requests)
-        else:
-            xp = np
-        request_count = xp.count_nonzero(new_requests)
+        request_count = self._xp.count_nonzero(new_requests)
         if request_count == 0:
             return
         # print(f"\n# requests = \t{request_count}")
         # create 1D array of new c values to compute
         to_compute_flat = self._c[new_requests]
+        dc_flat = None if self._dc is None else self._dc[new_requests]
+        cost_flat = self._predict_cost(new_requests) if self._compute_manager.backend.orders_by_cost else None
+        tiles_flat = self._tiles(new_requests) if self._compute_manager.early_stop_tile_size > 0 else None
+        resume_flat = self._resume(new_requests)
         # get the result as a flat array
         result_flat = yield from self._compute_manager.compute_flat_array(
             to_compute_flat,
-            self._early_stopping_iteration
+            self._early_stopping_iteration,
+            dc_flat,
+            cost_flat,
+            tiles_flat,
+            resume_flat
         )
         # early_stop_iteration = self._compute_manager.early_stop_iteration
         # if self._mandel.early_stop_iteration <= self._compute_manager.early_stop_iteration:
@@ -292,6 +352,136 @@ class Server:
         self._completed[new_requests] = True
         # populate 2D iteration array with the results
         self._iteration[new_requests] = result_flat
+        self._keep_capped(new_requests)
+        if self._compute_manager.interior_radius is not None:
+            self._fill_interior_disks(new_requests, self._compute_manager.interior_radius)
+
+    # z and iteration reached of each new request, None if there are none to resume
+    def _resume(self, new_requests: xp_ndarray) -> Optional[Tuple[xp_ndarray, xp_ndarray]]:
+        if not self._keeps_capped:
+            return None
+        resuming = self._capped & new_requests & (self._capped_iteration > 0)
+        count_resuming = int(self._xp.count_nonzero(resuming))
+        if count_resuming == 0:
+            return None
+        self._compute_manager.statistics.resumed_pixels += count_resuming
+        return self._capped_z[new_requests], self._xp.where(self._capped[new_requests],
+                                                            self._capped_iteration[new_requests], 0)
+
+    # the capped pixels among those just computed
+    def _keep_capped(self, new_requests: xp_ndarray):
+        if not self._keeps_capped:
+            return
+        capped_state = self._compute_manager.capped
+        if capped_state is None:
+            self._keeps_capped = False
+            return
+        index, z, iteration = capped_state
+        position = self._xp.flatnonzero(new_requests)[index]
+        self._capped[new_requests] = False
+        self._capped.reshape(-1)[position] = True
+        self._capped_z.reshape(-1)[position] = z
+        self._capped_iteration.reshape(-1)[position] = iteration
+
+    # capped state for the finished result, as on Mandel, None if it wasn't kept for every pixel
+    @property
+    def capped_state(self) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        if not self._keeps_capped:
+            return None
+        index = self._xp.flatnonzero(self._capped)
+        return (self._to_cpu(index),
+                self._to_cpu(self._capped_z.reshape(-1)[index]),
+                self._to_cpu(self._capped_iteration.reshape(-1)[index]))
+
+    # tile id of each new request, tiles are squares of early_stop_tile_size pixels numbered across then up
+    def _tiles(self, new_requests: xp_ndarray) -> xp_ndarray:
+        xp = self._xp
+        tile_size = self._compute_manager.early_stop_tile_size
+        height, width = new_requests.shape
+        tiles_across = -(-width // tile_size)
+        y, x = xp.nonzero(new_requests)
+        return (y // tile_size) * tiles_across + x // tile_size
+
+    # predicted iteration count of each new request, from the nearest completed pixels along its row and column
+    # such as the lines of the previous Mesh pass, taking the most of the up to four as near the set it is the most
+    # trapped counts as max_iterations, and so does a pixel with no completed pixel in line with it
+    def _predict_cost(self, new_requests: xp_ndarray) -> Optional[xp_ndarray]:
+        xp = self._xp
+        if not self._completed.any():
+            return None
+        max_iterations = self._compute_manager.max_iterations
+        value = xp.where(self._iteration < 0, max_iterations, self._iteration)
+        cost = xp.full(shape=self._completed.shape, fill_value=-1, dtype=xp.int64)
+        for axis in (0, 1):
+            for reverse in (False, True):
+                cost = xp.maximum(cost, self._nearest_completed(value, axis, reverse))
+        cost[cost < 0] = max_iterations
+        return cost[new_requests]
+
+    # value of the nearest completed pixel before each pixel along axis, or after if reverse, -1 where there isn't one
+    def _nearest_completed(self, value: xp_ndarray, axis: int, reverse: bool) -> xp_ndarray:
+        xp = self._xp
+        completed = self._completed
+        if reverse:
+            value = xp.flip(value, axis=axis)
+            completed = xp.flip(completed, axis=axis)
+        length = completed.shape[axis]
+        position = xp.arange(length).reshape((-1, 1) if axis == 0 else (1, -1))
+        # the position of the latest completed pixel so far, carried forward
+        latest = xp.maximum.accumulate(xp.where(completed, position, -1), axis=axis)
+        found = latest >= 0
+        nearest = xp.take_along_axis(value, xp.maximum(latest, 0), axis=axis)
+        nearest = xp.where(found, nearest, -1)
+        if reverse:
+            nearest = xp.flip(nearest, axis=axis)
+        return nearest
+
+    # pixels within the interior radius of a computed pixel are inside the set too, so are filled without computing
+    # the same as a box fill, completed with max_iterations
+    def _fill_interior_disks(self, new_requests: xp_ndarray, radius_flat: xp_ndarray):
+        xp = self._xp
+        radius_pixels = radius_flat / self._new_mandel.size_per_gap
+        # a disk less than a pixel in radius covers no other pixel
+        filling = radius_pixels >= 1.0
+        if not filling.any():
+            return
+        reach = min(_DISK_REACH, int(xp.max(radius_pixels[filling])))
+
+        # a pixel is in a disk if min over disks of distance^2 - radius^2 is negative
+        # that is a squared distance transform, which separates into rows then columns
+        # each done by shifting up to reach pixels, so overlapping disks cost nothing extra
+        weight = xp.full(shape=self._completed.shape, fill_value=xp.inf, dtype=xp.float64)
+        disk_requests = xp.zeros_like(new_requests)
+        disk_requests[new_requests] = filling
+        weight[disk_requests] = -(xp.minimum(radius_pixels[filling], reach) ** 2)
+        # only rows with a disk centre in them have anything to spread along
+        rows = xp.flatnonzero(disk_requests.any(axis=1))
+        weight[rows] = self._spread(weight[rows], reach, axis=1)
+        weight = self._spread(weight, reach, axis=0)
+
+        new = (weight < 0.0) & ~self._completed
+        self._iteration[new] = self._compute_manager.max_iterations
+        self._completed |= new
+        self._capped[new] = False
+        self._compute_manager.statistics.interior_disk_pixels += int(xp.count_nonzero(new))
+
+    # min over shifts s of weight shifted by s along axis plus s^2, for |s| <= reach
+    def _spread(self, weight: xp_ndarray, reach: int, axis: int) -> xp_ndarray:
+        xp = self._xp
+        spread = weight.copy()
+        length = weight.shape[axis]
+        for shift in range(1, min(reach, length - 1) + 1):
+            cost = float(shift * shift)
+            lower = [slice(None), slice(None)]
+            upper = [slice(None), slice(None)]
+            lower[axis] = slice(None, length - shift)
+            upper[axis] = slice(shift, None)
+            lower = tuple(lower)
+            upper = tuple(upper)
+            # slices are views, so spread is updated in place
+            xp.minimum(spread[upper], weight[lower] + cost, out=spread[upper])
+            xp.minimum(spread[lower], weight[upper] + cost, out=spread[lower])
+        return spread
 
     def _respond_to_requests(self):
         for request_ in self._requests:
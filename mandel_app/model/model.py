@@ -3,6 +3,8 @@ from __future__ import annotations
 import copy
 from typing import Optional, List
 
+import numpy as np
+
 from mandel_app import controller, tuples
 import thread
 from mandel_app.model import mandelbrot, z_model
@@ -26,19 +28,22 @@ class Model:
     def set_controller(self, controller_: controller.Controller):
         self._controller = controller_
 
-    def build(self, frame_shape: tuples.ImageShape):
+    def build(self,
+              frame_shape: tuples.ImageShape,
+              compute_config: Optional[mandelbrot.ComputeConfig] = None):
         self._frame_shape = frame_shape
         self.displayed_mandel = self._initial_mandel()
         # self.displayed_mandel = self._sticky_mandel()
         # self.displayed_mandel = self._slow_mandel()
         # self.displayed_mandel = self._different_mandel()
         self.new_mandel = self.displayed_mandel.lite_copy()
-        self._compute_manager = mandelbrot.ComputeManager(MAX_ITERATIONS)
+        self._compute_manager = mandelbrot.ComputeManager(MAX_ITERATIONS, config=compute_config)
         self._calc_thread_manager = thread.Manager(
             on_progress_update=self._on_progress_update,
             # on_active_change=self._on_active_change,
             on_stop_success=self._on_stop_success,
-            on_job_complete=self._on_job_complete
+            on_job_complete=self._on_job_complete,
+            on_quit=self._on_quit
         )
         self.z_model = z_model.ZModel()
         # self.z_model.build(z0=complex(real=0.24091, imag=0.55),
@@ -72,6 +77,11 @@ class Model:
 
         self._calc_thread_manager.request_job(mandel_job, queue_as=thread.QueueAs.SINGULAR)
 
+    # queued behind the views, the controller is told the result, see AutotuneJob
+    def calibrate(self, switch_backend: bool = True):
+        autotune_job = mandelbrot.AutotuneJob(compute_manager=self._compute_manager, switch_backend=switch_backend)
+        self._calc_thread_manager.request_job(autotune_job, queue_as=thread.QueueAs.ENQUEUE)
+
     def new_is_displayed(self, save_history: bool = True):
         if save_history and self.displayed_mandel is not None:
             self.mandel_history.append(self.displayed_mandel)
@@ -81,15 +91,15 @@ class Model:
                       frame_point: Optional[tuples.PixelPoint],
                       scaling: float):
         if frame_point is None:
-            new_centre = self.displayed_mandel.centre
+            new_centre = self.displayed_mandel.precise_centre
         else:
-            new_centre = self.displayed_mandel.get_complex_from_frame_point(
+            new_centre = self.displayed_mandel.get_precise_from_frame_point(
                 self._frame_shape, frame_point)
 
         save_history: bool = (scaling < 1)
 
         self.new_mandel = self.displayed_mandel.lite_copy(
-            centre=new_centre,
+            precise_centre=new_centre,
             size_per_gap=self.displayed_mandel.size_per_gap * scaling,
             shape=self._frame_shape,
             expected_iterations_per_pixel=self.displayed_mandel.iterations_per_pixel,
@@ -135,7 +145,7 @@ class Model:
             # self.new_mandel.centre = self.displayed_mandel.get_complex_from_frame_point(
             #     self._frame_shape, new_centre_frame_point)
 
-            self.new_mandel.centre = self.displayed_mandel.get_complex_from_center_diff(pan)
+            self.new_mandel.set_centre(self.displayed_mandel.get_precise_from_center_diff(pan))
 
         # if pan is not None:
         #     new_centre_frame_point = tuples.PixelPoint(
@@ -175,22 +185,55 @@ class Model:
             self.new_mandel = copy.deepcopy(self.displayed_mandel)
         self._controller.new_is_ready()
 
-    def request_stop(self):
-        self._calc_thread_manager.request_stop()
+    # finish: a job that finishes on stop is shown as it stands, False to throw it away
+    def request_stop(self, finish: bool = True):
+        self._calc_thread_manager.request_stop(finish)
+
+    # views are shown as they stand after time_budget seconds (0.0 for no limit), or on a stop if finish_on_stop
+    def set_finish_early(self, time_budget: float, finish_on_stop: bool):
+        self._compute_manager.time_budget = time_budget
+        self._compute_manager.finish_on_stop = finish_on_stop
 
-    def set_compute_parameters(self, max_iterations: Optional[int] = None, early_stopping: bool = True):
+    # returns True if the new mandel could be derived from the displayed one without computing, and is ready
+    def set_compute_parameters(self, max_iterations: Optional[int] = None, early_stopping: bool = True) -> bool:
         if max_iterations is None:
             self._compute_manager.max_iterations = MAX_ITERATIONS
         else:
             self._compute_manager.max_iterations = max_iterations
         self._compute_manager.early_stopping = early_stopping
 
+        if not self._is_derivable(self._compute_manager.max_iterations, early_stopping):
+            return False
+        self.new_mandel = self.displayed_mandel.clamped_copy(self._compute_manager.max_iterations)
+        self._controller.new_is_ready(save_history=True)
+        return True
+
+    # a lower max_iterations only clamps the counts already found
+    # unless early stopping is now off and pixels were early stopped short of it, as they need iterating further
+    # or the displayed result is provisional, as its pixels stopped short of it were never decided either way
+    def _is_derivable(self, max_iterations: int, early_stopping: bool) -> bool:
+        displayed = self.displayed_mandel
+        if displayed is None or displayed.iteration is None or max_iterations > displayed.max_iteration:
+            return False
+        if not (displayed.has_border or displayed.shape == self._frame_shape):
+            return False
+        if early_stopping and not displayed.provisional:
+            return True
+        if displayed.capped_iteration is not None:
+            reached = displayed.capped_iteration
+            return not bool(np.any((reached > 0) & (reached < max_iterations)))
+        statistics = displayed.compute_statistics
+        return statistics.early_stopped_pixels == 0 and statistics.unfinished_pixels == 0
+
     def no_border_and_calc(self):
         self.new_mandel = self.displayed_mandel.lite_copy(
             shape=self._frame_shape,
             has_border=False
         )
-        self.calc_new_mandel(save_history=True)
+        # the same view, so Server keeps what it can of the displayed result for the new compute parameters
+        offset = self._calc_offset(previous_shape=self.displayed_mandel.shape,
+                                   new_shape=self.new_mandel.shape)
+        self.calc_new_mandel(offset=offset, save_history=True)
     # endregion
 
     # region Events from Thread
@@ -205,6 +248,9 @@ class Model:
 
     def _on_job_complete(self, job: thread.Job):
         # print(f"completed job id = {id(job)}")
+        if isinstance(job, mandelbrot.AutotuneJob):
+            self._controller.compute_config_ready(job.compute_config)
+            return
         assert isinstance(job, mandelbrot.MandelJob)
         mandel_job: mandelbrot.MandelJob = job
         self.new_mandel = mandel_job.new_mandel
@@ -212,6 +258,9 @@ class Model:
             self.new_mandel.time_taken = job.progress_estimator.timer.total
         self._controller.new_is_ready(mandel_job.save_history)
 
+    def _on_quit(self):
+        self._compute_manager.shutdown()
+
     def add_border(self, mandel: mandelbrot.Mandel):
         border_size = 14*4*10    # add 5 large boxes in all directions
         current_shape = mandel.shape
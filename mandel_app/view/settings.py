@@ -2,6 +2,8 @@ from typing import Optional
 
 from PyQt5 import QtCore, QtWidgets
 
+from mandel_app.model.mandelbrot import compute
+
 
 class Settings:
     def __init__(self, reset: bool = False):
@@ -16,6 +18,7 @@ class Settings:
         # filtered settings
         self.window_settings: dict = self._filtered_settings('window')
         self.z_window_settings: dict = self._filtered_settings('z_window')
+        self.compute_settings: dict = self._filtered_settings('compute')
 
     def _set_defaults(self):
         self._begin_group("window")
@@ -28,6 +31,12 @@ class Settings:
         self._add_default("size", QtCore.QSize(400, 400))
         self._end_group()
 
+        # empty backend means autotune hasn't been run on this machine yet
+        self._begin_group("compute")
+        self._add_default("backend", "")
+        self._add_default("iterations_per_kernel", 1000)
+        self._end_group()
+
     def _read_settings(self, reset: bool = False):
         for setting, default in self._default.items():
             if reset:
@@ -56,6 +65,22 @@ class Settings:
         self._q_settings.setValue("size", q_main_window.size())
         self._q_settings.endGroup()
 
+    @property
+    def compute_config(self) -> Optional[compute.ComputeConfig]:
+        backend = str(self.compute_settings["backend"])
+        if not backend:
+            return None
+        # ini files on Linux give back strings
+        iterations_per_kernel = int(self.compute_settings["iterations_per_kernel"])
+        return compute.ComputeConfig(backend=backend, iterations_per_kernel=iterations_per_kernel)
+
+    def write_compute_settings(self, config: compute.ComputeConfig):
+        self._q_settings.beginGroup("compute")
+        self._q_settings.setValue("backend", config.backend)
+        self._q_settings.setValue("iterations_per_kernel", config.iterations_per_kernel)
+        self._q_settings.endGroup()
+        self.compute_settings = {"backend": config.backend, "iterations_per_kernel": config.iterations_per_kernel}
+
     # region default grouping
     def _begin_group(self, group: str):
         self._group = group
@@ -84,6 +84,11 @@ class View:
     @property
     def ready_to_display_new_mandel(self) -> bool:
         return self._view_state.ready_to_display_new_mandel
+
+    # None until autotune has been run on this machine
+    @property
+    def compute_config(self) -> Optional[mandelbrot.ComputeConfig]:
+        return self._settings.compute_config
     # endregion
 
     # region Controller Messages
@@ -97,7 +102,8 @@ class View:
         self._window.central.show_mandel(mandel)
         if not mandel.has_border:
             self._window.toolbars.dial.set_value(mandel.theta_degrees)
-            self._window.status_bar.display_time_taken(mandel.time_taken)
+            self._window.status_bar.display_time_taken(mandel.time_taken, mandel.provisional,
+                                                         mandel.compute_statistics)
             self._window.status_bar.refresh_mandel_statistics(mandel)
         # self._window.status_bar.q_progress_bar.setVisible(False)
         self._view_state.reset()
@@ -143,6 +149,9 @@ class View:
 
     def hide_z0_marker(self):
         self._window.central.hide_z0_marker()
+
+    def save_compute_config(self, config: mandelbrot.ComputeConfig):
+        self._settings.write_compute_settings(config)
     # endregion
 
     # region Connect Events
@@ -1,10 +1,10 @@
 import math
-from typing import Optional, Callable
+from typing import List, Optional, Callable, Union
 
 from PyQt5 import QtWidgets, QtCore, QtGui
 
 from mandel_app.view import widgets, common
-from mandel_app.model.mandelbrot import mandel
+from mandel_app.model.mandelbrot import mandel, precise_complex, compute_statistics
 
 
 class StatusBar:
@@ -111,35 +111,59 @@ class StatusBar:
         self._copy_icon_image.set_visible(True)
         self.verbose_mandel_statistics = self._get_mandel_statistics(mandel_, verbose=True)
 
-    def display_time_taken(self, total_time):
+    def display_time_taken(self,
+                           total_time,
+                           provisional: bool = False,
+                           statistics: Optional[compute_statistics.ComputeStatistics] = None):
         # pass
-        if total_time != 0.0:
+        if provisional:
+            message = f"Finished early after {total_time:.2f} seconds"
+        elif total_time != 0.0:
             message = f"Completed in {total_time:.2f} seconds"
         else:
             message = "Complete..."
+        if statistics is not None:
+            notes = self._compute_notes(statistics)
+            if notes:
+                message += " (" + ", ".join(notes) + ")"
         self._q_right_label.setText(message)
         self._q_progress_bar.setVisible(False)
         self._q_right_label.setVisible(True)
 
+    # settings the compute couldn't honour, so a slower or different result than expected is explained
+    @staticmethod
+    def _compute_notes(statistics: compute_statistics.ComputeStatistics) -> List[str]:
+        notes: List[str] = []
+        if statistics.unavailable_backend:
+            notes.append(f"{statistics.unavailable_backend} unavailable, using {statistics.backend}")
+        if statistics.backend_fallbacks > 0:
+            notes.append(f"fell back to {statistics.backend}")
+        if statistics.near_return_skipped_pixels > 0:
+            notes.append(f"near return not checked for {statistics.near_return_skipped_pixels} pixels")
+        return notes
+
     def display_point(self, z: complex):
         message = "point: " + self._complex_to_display_text(z, self._dp)
         self._q_left_label.setText(message)
 
     def _get_mandel_statistics(self, mandel_: mandel.Mandel, verbose: bool = False) -> str:
         if verbose:
-            message = "center: " + self._complex_to_display_text(mandel_.centre)
+            # enough places for the centre to be copied and used at any depth
+            places = 17 + max(0, round(-math.log10(mandel_.size_per_gap)))
+            message = "center: " + self._complex_to_display_text(mandel_.precise_centre.to_decimal(places))
             message += f"  size: {mandel_.x_size}"
             message += f"  rotation: {mandel_.theta_degrees} degrees"
         else:
             self._zoom_digits: int = max(0, round(-math.log10(mandel_.x_size)))
             self._dp = self._zoom_digits + 2
-            message = "center: " + self._complex_to_display_text(mandel_.centre, self._dp)
+            message = "center: " + self._complex_to_display_text(mandel_.precise_centre.to_decimal(self._dp), self._dp)
             message += f"  size: {mandel_.x_size:.3g}"
             message += f"  rotation: {mandel_.theta_degrees}" + u"\N{DEGREE SIGN}"
         return message
 
+    # z can also be exact decimals which format the same way, so deep zooms show every place
     @staticmethod
-    def _complex_to_display_text(z: complex, dp: Optional[int] = None) -> str:
+    def _complex_to_display_text(z: Union[complex, precise_complex.DecimalComplex], dp: Optional[int] = None) -> str:
         if dp is None:
             text = f"{z.real}"
         else:
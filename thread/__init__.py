@@ -2,5 +2,6 @@ from thread.enums import QueueAs
 from thread.job import Job
 from thread.manager import Manager
 from thread.progress_estimator import ProgressEstimator
+from thread.stop_token import StopToken
 from thread.worker import Worker
 from thread.state import State
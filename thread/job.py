@@ -2,9 +2,8 @@ from __future__ import annotations
 from typing import Callable, Optional, Generator
 from abc import ABC, abstractmethod
 
-from PyQt5 import QtWidgets
-
 from thread.progress_estimator import ProgressEstimator
+from thread.stop_token import StopToken
 
 
 class Job(ABC):
@@ -12,7 +11,11 @@ class Job(ABC):
     def __init__(self):
         self.job_number: int = 0
         self._in_progress: bool = False
-        self.stop_requested: bool = False
+        # set by request_stop from any thread, _exec can pass it down so its work stops part way through
+        self.stop_token: StopToken = StopToken()
+        # a stop request asks the job to finish early and complete with what it has, instead of abandoning it
+        self.finishes_on_stop: bool = False
+        self.finish_requested: bool = False
         self.progress_estimator: Optional[ProgressEstimator] = None
         self._job_checkpoint: Optional[Callable[[Job, float], None]] = None
 
@@ -22,6 +25,10 @@ class Job(ABC):
     @property
     def in_progress(self) -> bool:
         return self._in_progress
+
+    @property
+    def stop_requested(self) -> bool:
+        return self.stop_token.is_set()
     # endregion
 
     # region Run
@@ -52,9 +59,21 @@ class Job(ABC):
     def _exec(self) -> Generator[float, None, None]:
         pass
 
+    # safe from any thread
+    # finish: a job that finishes on stop is asked to finish early instead
+    def request_stop(self, finish: bool = False):
+        if finish and self.finishes_on_stop:
+            self.request_finish()
+        else:
+            self.stop_token.set()
+
+    # for jobs that finish on stop, override to wind up quickly, the job still completes
+    # called from any thread
+    def request_finish(self):
+        self.finish_requested = True
+
     def _check_if_stop_requested(self):
-        # let the thread event-queue run so this job can be requested to be stopped
-        QtWidgets.QApplication.processEvents()
+        # set from the thread that asked, so there is no need to run this thread's event queue to see it
         if self.stop_requested:
             self._in_progress = False
     # endregion
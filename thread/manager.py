@@ -1,4 +1,4 @@
-from typing import Optional, Callable
+from typing import List, Optional, Callable
 
 from PyQt5 import QtWidgets, QtCore
 
@@ -7,14 +7,15 @@ from thread import worker, job, enums, state
 
 class Manager(QtCore.QObject):
     _request_job = QtCore.pyqtSignal(job.Job, enums.QueueAs)
-    _request_stop = QtCore.pyqtSignal()
+    _request_stop = QtCore.pyqtSignal(bool)
 
     # region Setup
     def __init__(self,
                  on_progress_update: Optional[Callable[[job.Job, int], None]] = None,
                  # on_active_change: Optional[Callable[[bool], None]] = None,
                  on_stop_success: Optional[Callable[[], None]] = None,
-                 on_job_complete: Optional[Callable[[job.Job], None]] = None
+                 on_job_complete: Optional[Callable[[job.Job], None]] = None,
+                 on_quit: Optional[Callable[[], None]] = None
                  ):
         super().__init__()
         self._thread: QtCore.QThread = QtCore.QThread()
@@ -25,8 +26,12 @@ class Manager(QtCore.QObject):
         # self._on_active_change: Optional[Callable[[bool], None]] = on_active_change
         self._on_stop_success: Optional[Callable[[], None]] = on_stop_success
         self._on_job_complete: Optional[Callable[[job.Job], None]] = on_job_complete
+        self._on_quit: Optional[Callable[[], None]] = on_quit
 
         self._singular_job: Optional[job.Job] = None
+        # jobs requested and not yet complete, their stop tokens are set from here as soon as they are to stop
+        # rather than when the worker thread next gets round to its event queue
+        self._requested_jobs: List[job.Job] = []
 
     # @property
     # def worker_active(self) -> bool:
@@ -60,12 +65,23 @@ class Manager(QtCore.QObject):
 
     def request_job(self, job_: job.Job, queue_as: enums.QueueAs):
         if queue_as == enums.QueueAs.SINGULAR:
+            # replaced, so stopped outright even if they would finish on stop
+            self._stop_requested_jobs(finish=False)
             self._singular_job = job_
             # print(f"singular_job.id = {id(self._singular_job)}")
+        self._requested_jobs.append(job_)
         self._request_job.emit(job_, queue_as)
 
-    def request_stop(self):
-        self._request_stop.emit()
+    # finish: jobs that finish on stop are asked to finish early instead, False to stop them outright
+    def request_stop(self, finish: bool = True):
+        self._stop_requested_jobs(finish)
+        self._request_stop.emit(finish)
+
+    def _stop_requested_jobs(self, finish: bool):
+        for job_ in self._requested_jobs:
+            job_.request_stop(finish)
+        # those finishing can still be stopped outright
+        self._requested_jobs = [job_ for job_ in self._requested_jobs if not job_.stop_requested]
     # endregion
 
     # region Slots for Worker
@@ -84,6 +100,11 @@ class Manager(QtCore.QObject):
             self._on_stop_success()
 
     def job_complete_slot(self, job_: job.Job):
+        if job_ in self._requested_jobs:
+            self._requested_jobs.remove(job_)
+        # stopped outright after it completed but before this arrived, its result is no longer wanted
+        if job_.stop_requested:
+            return
         if self._on_job_complete is not None:
             if self._singular_job:
                 if job_ is self._singular_job:
@@ -96,6 +117,9 @@ class Manager(QtCore.QObject):
     def quit_thread(self):
         self._thread.quit()
         self._thread.wait()
+        # worker thread has finished so anything it was using can now be released
+        if self._on_quit is not None:
+            self._on_quit()
 
     def debug_message(self, message: str):
         print(message)
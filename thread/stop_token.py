@@ -0,0 +1,7 @@
+import threading
+
+
+# set from any thread to stop a job, and passed down to whatever does its work so it can stop part way through
+# a threading.Event so the code below can check it with is_set without depending on this package
+class StopToken(threading.Event):
+    pass
@@ -78,21 +78,22 @@ class Worker(QtCore.QObject):
     #     print(f"loop active : {self._job_loop_active}")
     #     print(f"stopping    : {self._stopping}")
 
-    def request_stop(self):
+    def request_stop(self, finish: bool = True):
         # cancel all jobs in the to_do queue
         # self._print_status("request_stop start")
         self._stopping = True
-        self._request_all_existing_jobs_stop()
+        self._request_all_existing_jobs_stop(finish)
         if not self._doing_queue:
             self._set_active(False)
             self.stopSuccess.emit()
             self._stopping = False
         # self._print_status("request_stop end")
 
-    def _request_all_existing_jobs_stop(self):
+    # finish: jobs that finish on stop are asked to finish early instead, not when they are being replaced
+    def _request_all_existing_jobs_stop(self, finish: bool = False):
         self._to_do_queue.clear()
         for job_ in self._doing_queue:
-            job_.stop_requested = True
+            job_.request_stop(finish)
     # endregion
 
     # region Job Processing